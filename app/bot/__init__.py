@@ -1,14 +1,29 @@
+import asyncio
+import logging
 import os
-import sqlite3
+from collections import defaultdict
 
 from telegram import Update
 from telegram.ext import Updater, CommandHandler
 
-from app.db import DB_URI
+from app.db.indexes import ensure_indexes
+from app.db.snapshot import (
+    prepare_snapshot_in_background,
+    restore_snapshot
+)
+from app.db.sync import exclusive, notify_reset
+from app.db.utils import get_columns_meta
+from app.metrics import Histogram, get_metrics, serve
 from .conversations.insert import InsertHandler
 from .conversations.predict import PredictHandler
 from .conversations.query import QueryHandler
+from .persistence import get_persistence
+from .runtime import AsyncRuntime
 from .types import CCT, DP
+from .webhook import run_cluster
+
+
+STATS_SHOWN = 15
 
 
 class Bot:
@@ -30,28 +45,105 @@ class Bot:
 
         update.message.reply_text(help_text)
 
+    def get_stats_text(self) -> str:
+        handlers = sorted(
+            (
+                metric for metric in get_metrics('handler_seconds')
+                if isinstance(metric, Histogram) and metric.count
+            ),
+            key=lambda metric: metric.sum,
+            reverse=True
+        )
+        stages: defaultdict[str, list[float]] = defaultdict(lambda: [0, 0])
+
+        for metric in get_metrics('stage_seconds'):
+            if isinstance(metric, Histogram):
+                stages[dict(metric.labels)['stage']][0] += metric.count
+                stages[dict(metric.labels)['stage']][1] += metric.sum
+
+        stats_text = 'Handlers by total time:\n'
+
+        for metric in handlers[:STATS_SHOWN]:
+            labels = dict(metric.labels)
+            stats_text += (
+                f'{labels["conversation"]}.{labels["callback"]}: '
+                f'{metric.count} calls, '
+                f'avg {metric.sum / metric.count * 1000:.1f} ms, '
+                f'p95 {metric.quantile(0.95) * 1000:.1f} ms, '
+                f'total {metric.sum:.2f} s\n'
+            )
+
+        stats_text += '\nStages:\n' + ''.join(
+            f'{name}: {count:.0f} calls, total {total:.2f} s\n'
+            for name, (count, total) in sorted(stages.items())
+        )
+        stats_text += '\nCoalesced calls:\n' + ''.join(
+            f'{dict(metric.labels)["operation"]}: {metric.value:.0f}\n'
+            for metric in get_metrics('coalesce_hits_total')
+            if not isinstance(metric, Histogram)
+        )
+        stats_text += '\nBytes sent: {:.0f}'.format(sum(
+            metric.value for metric in get_metrics('bytes_sent_total')
+            if not isinstance(metric, Histogram)
+        ))
+
+        return stats_text
+
+    def print_stats(self, update: Update, context: CCT) -> None:
+        if update.message.from_user.id not in self.admins:
+            logging.info(
+                f'User {update.message.from_user.id} was denied /stats.'
+            )
+
+            return
+
+        update.message.reply_text(self.get_stats_text())
+
     def reset_database(self, update: Update, context: CCT) -> None:
-        with sqlite3.connect(DB_URI) as conn:
-            conn.cursor().execute('DROP TABLE data')
-            conn.cursor().execute('''
-                CREATE TABLE data AS
-                SELECT * FROM original
-            ''')
+        with exclusive():
+            restore_snapshot()
+            ensure_indexes(get_columns_meta())
+            notify_reset()
 
         update.message.reply_text(
             'The database was reset to its original state.'
         )
 
-    def __init__(self) -> None:
-        self.updater = Updater(token=os.environ['BOT_TOKEN'], use_context=True)
+    def __init__(self, primary: bool = True) -> None:
+        self.updater = Updater(
+            token=os.environ['BOT_TOKEN'],
+            base_url=os.environ.get(
+                'TELEGRAM_BASE_URL',
+                'https://api.telegram.org/bot'
+            ),
+            base_file_url=os.environ.get(
+                'TELEGRAM_BASE_FILE_URL',
+                'https://api.telegram.org/file/bot'
+            ),
+            request_kwargs=dict(
+                con_pool_size=int(os.environ.get('HANDLER_WORKERS', 8)) + 4
+            ),
+            persistence=get_persistence(),  # type: ignore
+            use_context=True
+        )
         self.dispatcher: DP = getattr(self.updater, 'dispatcher')
+        self.admins: set[int] = {
+            int(user_id) for user_id
+            in os.environ.get('ADMIN_IDS', '').split(',') if user_id.strip()
+        }
+        ensure_indexes(get_columns_meta())
+
+        if primary:
+            prepare_snapshot_in_background()
 
         help_handler = CommandHandler('help', self.print_help)
         reset_DB_handler = CommandHandler('reset', self.reset_database)
+        stats_handler = CommandHandler('stats', self.print_stats)
 
         # generic commands
         self.dispatcher.add_handler(help_handler)
         self.dispatcher.add_handler(reset_DB_handler)
+        self.dispatcher.add_handler(stats_handler)
 
         # conversations
         self.dispatcher.add_handler(InsertHandler())
@@ -59,5 +151,20 @@ class Bot:
         self.dispatcher.add_handler(QueryHandler())
 
     def run(self) -> None:
-        self.updater.start_polling()
-        self.updater.idle()
+        if os.environ.get('METRICS_PORT'):
+            serve(
+                os.environ.get('METRICS_HOST', '127.0.0.1'),
+                int(os.environ['METRICS_PORT'])
+            )
+
+        if os.environ.get('BOT_RUNTIME') == 'asyncio':
+            asyncio.run(AsyncRuntime(
+                self.dispatcher,
+                max_pending=int(os.environ.get('MAX_PENDING_UPDATES', 256)),
+                workers=int(os.environ.get('HANDLER_WORKERS', 8))
+            ).run())
+        elif os.environ.get('BOT_RUNTIME') == 'webhook':
+            run_cluster(self)
+        else:
+            self.updater.start_polling()
+            self.updater.idle()
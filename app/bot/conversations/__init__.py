@@ -1,10 +1,21 @@
+import functools
 import logging
-from typing import cast
+from collections.abc import Callable
+from itertools import chain
+from typing import Any, cast
 
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ConversationHandler
 
 from app.db.utils import get_columns_meta
+from app.metrics import (
+    LATENCY_BUCKETS,
+    counter,
+    histogram,
+    labelled,
+    timed
+)
+from ..persistence import get_persistence
 from ..types import CCT
 
 
@@ -18,6 +29,51 @@ class BaseHandler(ConversationHandler[CCT]):
 
         return cast('BaseHandler', inst)
 
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(
+            name=type(self).__name__,
+            persistent=get_persistence() is not None,
+            **kwargs
+        )
+
+        for handler in chain(
+            self.entry_points,
+            *self.states.values(),
+            self.fallbacks
+        ):
+            handler.callback = self.instrument(handler.callback)
+
+    def instrument(
+        self,
+        callback: Callable[[Update, CCT], Any]
+    ) -> Callable[[Update, CCT], Any]:
+        labels = dict(
+            conversation=type(self).__name__,
+            callback=callback.__name__
+        )
+        latency = histogram(
+            'handler_seconds',
+            'Latency of conversation state callbacks',
+            LATENCY_BUCKETS,
+            **labels
+        )
+        errors = counter(
+            'handler_errors_total',
+            'Conversation state callbacks that raised',
+            **labels
+        )
+
+        @functools.wraps(callback)
+        def wrapper(update: Update, context: CCT) -> Any:
+            with labelled(**labels), timed(latency):
+                try:
+                    return callback(update, context)
+                except Exception:
+                    errors.inc()
+                    raise
+
+        return wrapper
+
     def cancel(self, update: Update, context: CCT) -> int:
         username: str = update.message.from_user.first_name
         context.user_data['filters'] = {}
@@ -1,7 +1,9 @@
+import io
 import logging
-import sqlite3
+from typing import TYPE_CHECKING, Optional
 
 from telegram import (
+    Document,
     Update,
     ReplyKeyboardMarkup,
     ForceReply,
@@ -9,10 +11,20 @@ from telegram import (
 )
 from telegram.ext import CommandHandler, MessageHandler, Filters
 
-from app.db import DB_URI
+from app.db.utils import get_columns_types
+from app.db.writer import get_writer
+from app.metrics import stage
 from . import BaseHandler
 from ..types import CCT
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from app.db.bulk import Rejects
+
+
+REJECTS_SHOWN = 20
+
 
 class InsertHandler(BaseHandler):
     ENTERING_PRICE, ENTERING_OTHERS, PROMPTING_RETRY = range(3)
@@ -24,10 +36,16 @@ class InsertHandler(BaseHandler):
                 self.handle_insert_command
             )],
             states={
-                self.ENTERING_PRICE: [MessageHandler(
-                    Filters.text & ~Filters.command,
-                    self.handle_entering_price
-                )],
+                self.ENTERING_PRICE: [
+                    MessageHandler(
+                        Filters.text & ~Filters.command,
+                        self.handle_entering_price
+                    ),
+                    MessageHandler(
+                        Filters.document,
+                        self.handle_bulk_upload
+                    )
+                ],
                 self.ENTERING_OTHERS: [MessageHandler(
                     Filters.text & ~Filters.command,
                     self.handle_entering_others
@@ -43,7 +61,10 @@ class InsertHandler(BaseHandler):
     def initial_reply(self, update: Update) -> None:
         update.message.reply_text(
             'We are in insert mode. '
-            'Enter the price value for the new record:',
+            'Enter the price value for the new record:\n\n'
+            'To insert many records at once, send several lines of '
+            'comma-separated values (price first, then the rest) '
+            'or upload a CSV or Excel file with a header row.',
             reply_markup=ForceReply()
         )
 
@@ -54,6 +75,9 @@ class InsertHandler(BaseHandler):
         return self.ENTERING_PRICE
 
     def handle_entering_price(self, update: Update, context: CCT) -> int:
+        if '\n' in update.message.text.strip():
+            return self.handle_bulk_lines(update, context)
+
         context.user_data['insert']['price_doc'] = update.message.text
 
         variable_list: str = self.get_descriptions_string(
@@ -81,18 +105,11 @@ class InsertHandler(BaseHandler):
                 in zip(self.columns.keys(), values)
             }
 
-            SQL = f'''
-                INSERT INTO data ({
-                    ', '.join(context.user_data['insert'].keys())
-                })
-                VALUES ('{
-                    "', '".join(context.user_data['insert'].values())
-                }')
-            '''
-            logging.info(SQL.lstrip())
-
-            with sqlite3.connect(DB_URI) as conn:
-                conn.cursor().execute(SQL)
+            record: dict[str, str] = context.user_data['insert']
+            logging.info(f'Inserting record: {record}')
+            get_writer().submit(record).result()
+        except ValueError as ex:
+            text = f'Insert failed: {ex} Would you like to try again?'
         except Exception:
             text = 'Insert failed. Would you like to try again?'
         else:
@@ -109,6 +126,101 @@ class InsertHandler(BaseHandler):
 
             return self.PROMPTING_RETRY
 
+    def handle_bulk_lines(self, update: Update, context: CCT) -> int:
+        import pandas as pd
+
+        names: list[str] = ['price_doc', *self.columns.keys()]
+        rows: list[list[str]] = [
+            line.split(',')
+            for line in update.message.text.strip().splitlines()
+        ]
+        df = pd.DataFrame(
+            [row for row in rows if len(row) == len(names)],
+            columns=names,
+            index=[i for i, row in enumerate(rows) if len(row) == len(names)]
+        )
+        malformed: 'Rejects' = [
+            (i + 1, 'wrong number of values')
+            for i, row in enumerate(rows) if len(row) != len(names)
+        ]
+
+        return self.insert_bulk(update, df, malformed)
+
+    def handle_bulk_upload(self, update: Update, context: CCT) -> int:
+        import pandas as pd
+
+        document: Document = update.message.document
+        ext: str = document.file_name.split('.')[-1].lower()
+        file = io.BytesIO()
+        document.get_file().download(out=file)
+        file.seek(0)
+
+        try:
+            if ext == 'csv':
+                df: pd.DataFrame = pd.read_csv(file, dtype=str)
+            elif ext in ('xls', 'xlsx'):
+                df = pd.read_excel(file, dtype=str)
+            else:
+                raise ValueError(f'Unsupported extension: {ext}')
+        except Exception as ex:
+            logging.error(f'DataFrame import error: {ex}')
+            update.message.reply_text(
+                'Could not read from file. Upload a CSV or Excel file, '
+                'or type /cancel to exit.',
+                reply_markup=ForceReply()
+            )
+
+            return self.ENTERING_PRICE
+
+        return self.insert_bulk(update, df)
+
+    def insert_bulk(
+        self,
+        update: Update,
+        df: 'pd.DataFrame',
+        malformed: Optional['Rejects'] = None
+    ) -> int:
+        from app.db.bulk import insert_records, validate_records
+
+        with stage('pandas'):
+            df, rejects = validate_records(df, get_columns_types())
+
+        rejects = sorted(rejects + (malformed or []))
+
+        try:
+            inserted = insert_records(df) if len(df) else 0
+        except Exception as ex:
+            logging.error(f'Bulk insert error: {ex}')
+            text = 'Insert failed. Would you like to try again?'
+        else:
+            logging.info(
+                f'Bulk insert: {inserted} rows inserted, '
+                f'{len(rejects)} rejected.'
+            )
+            text = (
+                f'{inserted} records inserted, '
+                f'{len(rejects)} rejected.\n\n'
+                + ''.join(
+                    f'row {row}: {reason}\n'
+                    for row, reason in rejects[:REJECTS_SHOWN]
+                )
+                + (
+                    f'...and {len(rejects) - REJECTS_SHOWN} more.\n'
+                    if len(rejects) > REJECTS_SHOWN else ''
+                )
+                + '\nWould you like to insert more?'
+            )
+
+        update.message.reply_text(
+            text,
+            reply_markup=ReplyKeyboardMarkup(
+                [['YES', 'NO']],
+                one_time_keyboard=True
+            )
+        )
+
+        return self.PROMPTING_RETRY
+
     def handle_prompting_retry(self, update: Update, context: CCT) -> int:
         answer: str = update.message.text
         context.user_data['insert'] = {}
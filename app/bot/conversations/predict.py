@@ -1,9 +1,9 @@
 import logging
 import io
-import sqlite3
+import threading
+from tempfile import SpooledTemporaryFile
+from typing import IO, Any
 
-import pandas as pd
-from sklearn.linear_model import LinearRegression
 from telegram import (
     Update,
     ReplyKeyboardMarkup,
@@ -13,13 +13,13 @@ from telegram import (
 )
 from telegram.ext import CommandHandler, MessageHandler, Filters
 
-from app.db import DB_URI
+from app.metrics import sent, stage
 from . import BaseHandler
 from ..types import CCT
 
 
 class PredictHandler(BaseHandler):
-    __slots__ = 'params', 'model'
+    __slots__ = 'params'
     FILE_UPLOAD, PROMPTING_ANOTHER = range(2)
 
     def set_up_prediction_model(self) -> None:
@@ -28,20 +28,16 @@ class PredictHandler(BaseHandler):
             if key not in ('product_type', 'sub_area')
         ]
 
-        with sqlite3.connect(DB_URI) as conn:
-            df: pd.DataFrame = pd.read_sql_query(
-                sql=f'''
-                    SELECT {', '.join(self.params)}, price_doc
-                    FROM data
-                ''',
-                con=conn
-            )
+        threading.Thread(
+            target=self.fit_prediction_model,
+            name='prediction-model-fit',
+            daemon=True
+        ).start()
 
-        X = df[[*self.params]]
-        y = df['price_doc'] / (10 ** 6)
+    def fit_prediction_model(self) -> None:
+        from app.ml.registry import get_registry
 
-        self.model = LinearRegression()
-        self.model.fit(X=X, y=y)
+        get_registry().get(self.params, holdout=False)
 
     def __init__(self) -> None:
         self.set_up_prediction_model()
@@ -98,49 +94,50 @@ class PredictHandler(BaseHandler):
 
             return self.FILE_UPLOAD
 
-        file = io.BytesIO(document.get_file().download_as_bytearray())
+        from app.ml.batch import (
+            SPOOL_BYTES,
+            PredictionError,
+            predict_csv,
+            predict_excel
+        )
+        from app.ml.registry import get_registry
+
+        file: 'SpooledTemporaryFile[Any]' = SpooledTemporaryFile(
+            max_size=SPOOL_BYTES
+        )
+        document.get_file().download(out=file)
+        file.seek(0)
+        model = get_registry().get(self.params, holdout=False)
 
         try:
-            if ext == 'csv':
-                df: pd.DataFrame = pd.read_csv(file)
-            elif ext in ('xls', 'xlsx'):
-                df = pd.read_excel(file)
-        except Exception as ex:
-            logging.error(f'DataFrame import error: {ex}')
+            with stage('pandas'):
+                if ext == 'csv':
+                    output: IO[bytes] = predict_csv(file, model)
+                else:
+                    output, ext = predict_excel(file, model)
+        except PredictionError as ex:
+            logging.error(f'Prediction attempt error: {ex}')
             update.message.reply_text(
-                'Could not read from file. Try another one or '
-                'type /cancel to exit.',
+                'Could not calculate prediction based on the received data. '
+                'Try another file or type /cancel to exit.',
                 reply_markup=ForceReply()
             )
 
             return self.FILE_UPLOAD
-
-        try:
-            X = df[[*self.params]]
-            df_predicted = pd.DataFrame(
-                self.model.predict(X),
-                columns=['price_mil']
-            )
         except Exception as ex:
-            logging.error(f'Prediction attempt error: {ex}')
+            logging.error(f'DataFrame import error: {ex}')
             update.message.reply_text(
-                'Could not calculate prediction based on the received data. '
-                'Try another file or type /cancel to exit.',
+                'Could not read from file. Try another one or '
+                'type /cancel to exit.',
                 reply_markup=ForceReply()
             )
 
             return self.FILE_UPLOAD
+        finally:
+            file.close()
 
-        df = pd.concat([df, df_predicted], axis=1)
-        output = io.BytesIO()
-
-        if ext == 'csv':
-            df.to_csv(output)
-        elif ext in ('xls', 'xlsx'):
-            df.to_excel(output)
-
+        size = output.seek(0, io.SEEK_END)
         output.seek(0)
-
         update.message.reply_document(
             document=output,
             filename=f'output.{ext}',
@@ -151,6 +148,8 @@ class PredictHandler(BaseHandler):
                 one_time_keyboard=True
             )
         )
+        output.close()
+        sent(size)
         logging.info(
             'Sent calculated prediction to '
             f'{update.message.from_user.first_name} '
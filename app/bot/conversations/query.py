@@ -1,11 +1,9 @@
-import sqlite3
-from collections.abc import Iterable
-from io import BytesIO
-
-import matplotlib.pyplot as plt
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
+import csv
+import io
+import math
+from tempfile import SpooledTemporaryFile
+from typing import TYPE_CHECKING, Any, Optional
+
 from telegram import (
     Update,
     ReplyKeyboardMarkup,
@@ -15,13 +13,40 @@ from telegram import (
 )
 from telegram.ext import CommandHandler, MessageHandler, Filters
 
-from app.db import DB_URI
+from app.coalesce import get_flight
+from app.db.cube import get_cube
+from app.db.filters import (
+    Binding,
+    Predicate,
+    build_where,
+    get_predicate,
+    normalize_filters
+)
+from app.db.indexes import advisor
+from app.db.pool import pool
+from app.db.utils import get_columns_types
+from app.db.sync import get_generation
+from app.metrics import sent, stage
 from . import BaseHandler
 from ..types import CCT, DataRecord
 
+if TYPE_CHECKING:
+    from app.db.sample import Estimate
+
+
+PAGE_ROWS = 20
+MESSAGE_LIMIT = 4096
+SPOOL_BYTES = 16 * 2 ** 20
+
 
 class QueryHandler(BaseHandler):
-    CHOOSING, FILTERING, PROMPTING_OUTPUT, PROMPTING_PREDICTION = range(4)
+    (
+        CHOOSING,
+        FILTERING,
+        PROMPTING_OUTPUT,
+        PROMPTING_PREDICTION,
+        PAGING
+    ) = range(5)
 
     def __init__(self) -> None:
         super().__init__(
@@ -32,16 +57,27 @@ class QueryHandler(BaseHandler):
                         Filters.regex(f'^({"|".join(self.columns.keys())})$'),
                         self.handle_choosing
                     ),
-                    CommandHandler('charts', self.handle_charts_command)
+                    CommandHandler(
+                        'charts',
+                        self.handle_charts_command,
+                        run_async=True
+                    ),
+                    CommandHandler('output', self.handle_output_command),
+                    CommandHandler('exact', self.handle_exact_command),
+                    CommandHandler('csv', self.handle_csv, run_async=True)
                 ],
                 self.FILTERING: [MessageHandler(
                     Filters.text & ~Filters.command,
                     self.handle_filtering
                 )],
                 self.PROMPTING_OUTPUT: [MessageHandler(
-                    Filters.regex('^(output|continue)$'),
+                    Filters.regex('^(output|csv|continue)$'),
                     self.handle_output_prompt
                 )],
+                self.PAGING: [MessageHandler(
+                    Filters.regex('^(next page|csv|done)$'),
+                    self.handle_paging
+                )],
                 self.PROMPTING_PREDICTION: [MessageHandler(
                     Filters.regex('^(YES|NO)$'),
                     self.handle_prediction_prompt
@@ -78,7 +114,12 @@ class QueryHandler(BaseHandler):
         param: str = update.message.text
         context.user_data['param'] = param
         update.message.reply_text(
-            f'Now enter the target value for parameter: {param}.',
+            f'Now enter the target value for parameter: {param}.\n\n'
+            'You can also enter a list of values (1,2,3)'
+            + (
+                ' or a range (50..80, >=2000, <=5).'
+                if get_columns_types()[param] != 'TEXT' else '.'
+            ),
             reply_markup=ForceReply()
         )
 
@@ -86,21 +127,45 @@ class QueryHandler(BaseHandler):
 
     def handle_filtering(self, update: Update, context: CCT) -> int:
         value: str = update.message.text
-        context.user_data['filters'] |= {context.user_data['param']: value}
+        param: str = context.user_data['param']
 
-        WHERE_SQL = 'WHERE ' + ' AND '.join(
-            f'{key} = {value}'
-            for key, value in context.user_data['filters'].items()
+        try:
+            WHERE_SQL, bindings = build_where(
+                context.user_data['filters'] | {param: value}
+            )
+        except ValueError as ex:
+            update.message.reply_text(
+                f'Could not use this value: {ex}\n\n'
+                f'Enter another target value for parameter: {param}.',
+                reply_markup=ForceReply()
+            )
+
+            return self.FILTERING
+
+        context.user_data['filters'] |= {param: value}
+        advisor.observe(
+            WHERE_SQL,
+            bindings,
+            context.user_data['filters'].keys()
         )
 
-        with sqlite3.connect(DB_URI) as conn:
-            count, avg_price = conn.cursor().execute(f'''
-                SELECT
-                    count(price_doc)
-                ,   avg(price_doc)
-                FROM data
-                {WHERE_SQL}
-            ''').fetchone()
+        return self.reply_aggregates(update, context)
+
+    def handle_exact_command(self, update: Update, context: CCT) -> int:
+        return self.reply_aggregates(update, context, exact=True)
+
+    def reply_aggregates(
+        self,
+        update: Update,
+        context: CCT,
+        exact: bool = False
+    ) -> int:
+        filters: dict[str, str] = context.user_data['filters']
+        WHERE_SQL, bindings = build_where(filters)
+        count, avg_price, result, estimate = get_flight('aggregates').do(
+            (normalize_filters(filters), get_generation(), exact),
+            lambda: self.get_aggregates(filters, WHERE_SQL, bindings, exact)
+        )
 
         if count == 0:
             update.message.reply_text(
@@ -115,12 +180,12 @@ class QueryHandler(BaseHandler):
 
             return self.PROMPTING_PREDICTION
         elif count == 1:
-            with sqlite3.connect(DB_URI) as conn:
-                result: DataRecord = conn.cursor().execute(f'''
-                    SELECT *
-                    FROM data
-                    {WHERE_SQL}
-                ''').fetchone()
+            if result is None:
+                [(_, result)] = self.fetch_page(
+                    context.user_data['filters'],
+                    after=-1,
+                    limit=1
+                )
 
             single_record: str = '\n'.join((
                 f'{key} = {value}'
@@ -136,14 +201,14 @@ class QueryHandler(BaseHandler):
             context.user_data['filters'] = {}
 
             return self.END
-        elif count <= 10:
+        elif count <= PAGE_ROWS:
             update.message.reply_text(
                 f'Average price = {avg_price:.2f}.\n\n'
                 f'{count} records met the current filtering conditions.\n\n'
-                'Would you like to output these records '
-                'or to continue filtering?',
+                'Would you like to output these records, '
+                'get them as a CSV file or to continue filtering?',
                 reply_markup=ReplyKeyboardMarkup(
-                    [['output', 'continue']],
+                    [['output', 'csv', 'continue']],
                     one_time_keyboard=True
                 )
             )
@@ -152,12 +217,24 @@ class QueryHandler(BaseHandler):
 
         params: list[str] = self.get_not_yet_filtered_params(context)
         descriptions: str = self.get_descriptions_string(params)
-
-        update.message.reply_text(
+        summary: str = (
             f'Average price = {avg_price:.2f}.\n\n'
             f'{count} records met the current filtering conditions.\n\n'
+            if estimate is None else
+            f'Average price ≈ {avg_price:.2f} ± {estimate.avg_error:.2f}.'
+            '\n\n'
+            f'About {count} ± {estimate.records_error:.0f} records met the '
+            'current filtering conditions (95% confidence, estimated from '
+            f'{estimate.sample_rows} sampled records).\n\n'
+            'Type /exact to compute the exact values.\n\n'
+        )
+
+        update.message.reply_text(
+            f'{summary}'
             'Choose another parameter to narrow down the current selection '
             'or type /cancel to quit query mode.\n\n'
+            'Type /output to page through these records '
+            'or /csv to get them as a CSV file.\n\n'
             + (
                 'You can also type /charts to get visualization of how the '
                 'price depends on each of the not yet filtered parameters '
@@ -173,35 +250,184 @@ class QueryHandler(BaseHandler):
 
         return self.CHOOSING
 
-    def handle_output_prompt(self, update: Update, context: CCT) -> int:
-        value: str = update.message.text
+    def get_aggregates(
+        self,
+        filters: dict[str, str],
+        WHERE_SQL: str,
+        bindings: list[Binding],
+        exact: bool = False
+    ) -> tuple[
+        int, Optional[float], Optional[DataRecord], Optional['Estimate']
+    ]:
+        from app.db.columnar import get_engine
+        from app.db.sample import get_sample
+
+        engine = get_engine()
+        aggregates = get_cube().count_and_avg(filters)
+
+        if aggregates is not None:
+            return (*aggregates, None, None)
+
+        sample = None if exact else get_sample()
+        estimate = None if sample is None else sample.estimate(filters)
+
+        if estimate is not None and estimate.precise:
+            return estimate.records, estimate.avg, None, estimate
+        elif engine is not None:
+            return (*engine.count_and_avg(filters), None, None)
+
+        with pool.read() as conn:
+            count, avg_price, _, *record = conn.execute(f'''
+                SELECT
+                    count(price_doc)
+                ,   avg(price_doc)
+                ,   max(price_doc)
+                ,   *
+                FROM data
+                {WHERE_SQL}
+            ''', bindings).fetchone()
 
-        if value == 'output':
-            WHERE_SQL = 'WHERE ' + ' AND '.join(
-                f'{key} = {value}' for key, value
-                in context.user_data['filters'].items()
-            )
+        return count, avg_price, tuple(record), None
 
-            with sqlite3.connect(DB_URI) as conn:
-                result: Iterable[DataRecord] = conn.cursor().execute(f'''
-                    SELECT *
+    def fetch_page(
+        self,
+        filters: dict[str, str],
+        after: int,
+        limit: int
+    ) -> list[tuple[int, Any]]:
+        from app.db.columnar import get_engine
+
+        engine = get_engine()
+
+        if engine is not None:
+            return engine.page(filters, after, limit)
+
+        WHERE_SQL, bindings = build_where(
+            filters,
+            Predicate('rowid', '>', (after,))
+        )
+
+        with pool.read() as conn:
+            return [
+                (rowid, record) for rowid, *record in conn.execute(f'''
+                    SELECT rowid, *
                     FROM data
                     {WHERE_SQL}
-                ''')
+                    ORDER BY rowid
+                    LIMIT ?
+                ''', (*bindings, limit))
+            ]
+
+    def send_page(self, update: Update, context: CCT) -> int:
+        after, shown = context.user_data['page']
+        rows = self.fetch_page(
+            context.user_data['filters'],
+            after,
+            PAGE_ROWS + 1
+        )
+        lines: list[str] = []
+        size = 0
 
-            multiple_records: str = '\n'.join((
-                f'{i}: {value}'
-                for i, value in enumerate(result, 1)
-            ))
+        for rowid, record in rows[:PAGE_ROWS]:
+            line = f'{shown + 1}: {tuple(record)}'
+            size += len(line) + 1
 
+            if lines and size > MESSAGE_LIMIT - 200:
+                break
+
+            lines.append(line)
+            after, shown = rowid, shown + 1
+
+        page = '\n'.join(lines)
+
+        if len(rows) > len(lines):
+            context.user_data['page'] = after, shown
             update.message.reply_text(
-                f'{multiple_records}\n\n'
-                'Exiting query mode.',
-                reply_markup=ReplyKeyboardRemove()
+                f'{page}\n\n'
+                'Would you like to see the next page, '
+                'get all records as a CSV file or stop here?',
+                reply_markup=ReplyKeyboardMarkup(
+                    [['next page', 'csv', 'done']],
+                    one_time_keyboard=True
+                )
             )
-            context.user_data['filters'] = {}
 
-            return self.END
+            return self.PAGING
+
+        update.message.reply_text(
+            f'{page}\n\n'
+            'Exiting query mode.',
+            reply_markup=ReplyKeyboardRemove()
+        )
+        context.user_data['filters'] = {}
+
+        return self.END
+
+    def handle_output_command(self, update: Update, context: CCT) -> int:
+        context.user_data['page'] = -1, 0
+
+        return self.send_page(update, context)
+
+    def handle_paging(self, update: Update, context: CCT) -> int:
+        value: str = update.message.text
+
+        if value == 'next page':
+            return self.send_page(update, context)
+        elif value == 'csv':
+            return self.handle_csv(update, context)
+
+        update.message.reply_text(
+            'Exiting query mode.',
+            reply_markup=ReplyKeyboardRemove()
+        )
+        context.user_data['filters'] = {}
+
+        return self.END
+
+    def handle_csv(self, update: Update, context: CCT) -> int:
+        update.message.reply_text(
+            'Building CSV...',
+            reply_markup=ReplyKeyboardRemove()
+        )
+
+        file: 'SpooledTemporaryFile[bytes]' = SpooledTemporaryFile(
+            max_size=SPOOL_BYTES
+        )
+        text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+        WHERE_SQL, bindings = build_where(context.user_data['filters'])
+
+        with pool.read() as conn:
+            cursor = conn.execute(f'''
+                SELECT *
+                FROM data
+                {WHERE_SQL}
+            ''', bindings)
+            writer = csv.writer(text)
+            writer.writerow(column for column, *_ in cursor.description)
+            writer.writerows(cursor)
+
+        text.flush()
+        text.detach()
+        size = file.tell()
+        file.seek(0)
+        update.message.reply_document(
+            document=file,
+            filename='records.csv',
+            caption='Exiting query mode.'
+        )
+        file.close()
+        sent(size)
+        context.user_data['filters'] = {}
+
+        return self.END
+
+    def handle_output_prompt(self, update: Update, context: CCT) -> int:
+        value: str = update.message.text
+
+        if value == 'output':
+            return self.handle_output_command(update, context)
+        elif value == 'csv':
+            return self.handle_csv(update, context)
         elif value == 'continue':
             params: list[str] = self.get_not_yet_filtered_params(context)
             descriptions: str = self.get_descriptions_string(params)
@@ -221,46 +447,75 @@ class QueryHandler(BaseHandler):
         return self.END
 
     def get_chart_images(self, context: CCT) -> list[InputMediaPhoto]:
-        params: list[str] = self.get_not_yet_filtered_params(context)
-        VARS_SQL = ', '.join(params)
-        WHERE_SQL = 'WHERE ' + ' AND '.join(
-            f'{key} = {value}'
-            for key, value in context.user_data['filters'].items()
+        params: list[str] = [
+            param for param in self.get_not_yet_filtered_params(context)
+            if param not in ('product_type', 'sub_area')
+        ]
+        filters: dict[str, str] = context.user_data['filters']
+        key = (normalize_filters(filters), get_generation())
+        images: dict[str, bytes] = get_flight('charts').do(
+            (*key, tuple(params)),
+            lambda: self.render_charts(filters, params, key)
         )
 
-        with sqlite3.connect(DB_URI) as conn:
-            df: pd.DataFrame = pd.read_sql_query(
-                sql=f'SELECT {VARS_SQL}, price_doc FROM data {WHERE_SQL}',
-                con=conn
-            )
+        sent(sum(len(images[param]) for param in params))
 
-        label_size = 25
-        plt.rcParams.update({
-            'axes.labelsize': label_size,
-            'xtick.labelsize': label_size,
-            'ytick.labelsize': label_size,
-            'figure.figsize': (15, 15)
-        })
+        return [InputMediaPhoto(images[param]) for param in params]
 
-        images: list[InputMediaPhoto] = []
+    def render_charts(
+        self,
+        filters: dict[str, str],
+        params: list[str],
+        key: tuple[Any, ...]
+    ) -> dict[str, bytes]:
+        from app.charts import get_cache, get_renderer
 
-        for param in (
-            param for param in params
-            if param not in ('product_type', 'sub_area')
-        ):
-            plt.clf()
-            plt.xlabel(self.columns[param])
-            plt.ylabel('sale price')
-            plt.hexbin(
-                x=df[param],
-                y=df['price_doc'].apply(lambda x: x / (10 ** 6)),
-                gridsize=50,
-                cmap='coolwarm'
+        cache = get_cache()
+        predicates, _ = key
+        version = cache.version
+        images: dict[str, bytes] = {}
+
+        for param in params:
+            image: Optional[bytes] = cache.get((predicates, param))
+
+            if image is not None:
+                images[param] = image
+
+        missing: list[str] = [
+            param for param in params if param not in images
+        ]
+
+        if missing:
+            from app.db.frames import get_frame_schema
+            from app.db.sample import get_sample
+
+            sample = get_sample()
+            df = None if sample is None else sample.frame(
+                filters,
+                [*missing, 'price_doc']
             )
 
-            image_io = BytesIO()
-            plt.savefig(image_io)
-            images.append(InputMediaPhoto(image_io.getvalue()))
+            if df is None:
+                VARS_SQL = ', '.join(missing)
+                WHERE_SQL, bindings = build_where(filters)
+                df = get_frame_schema().read_frame(
+                    f'SELECT {VARS_SQL}, price_doc FROM data {WHERE_SQL}',
+                    bindings
+                )
+
+            with stage('render'):
+                rendered: list[bytes] = get_renderer().render([
+                    (
+                        self.columns[param],
+                        df[param].to_numpy(),
+                        (df['price_doc'] / (10 ** 6)).to_numpy()
+                    )
+                    for param in missing
+                ])
+
+            for param, rendered_image in zip(missing, rendered):
+                cache.put((predicates, param), rendered_image, version)
+                images[param] = rendered_image
 
         return images
 
@@ -276,39 +531,35 @@ class QueryHandler(BaseHandler):
 
         return self.END
 
+    def get_point(self, predicate: Predicate) -> float:
+        values = [
+            float(value) for value in predicate.values if value is not None
+        ]
+
+        return sum(values) / len(values) if values else math.nan
+
     def get_prediction(self, context: CCT) -> tuple[float, float]:
         params = {
             key: value for key, value in context.user_data['filters'].items()
             if key not in ('product_type', 'sub_area')
         }
 
-        with sqlite3.connect(DB_URI) as conn:
-            df: pd.DataFrame = pd.read_sql_query(
-                sql=f'''
-                    SELECT {', '.join(params)}, price_doc
-                    FROM data
-                ''',
-                con=conn
-            )
+        from app.ml.registry import get_registry
 
-        X = df[[*params]]
-        y = df['price_doc'] / (10 ** 6)
+        def predict() -> tuple[float, float]:
+            model = get_registry().get([*params])
 
-        X_train, X_test, y_train, y_test = train_test_split(
-            X,
-            y,
-            test_size=0.33,
-            random_state=42
-        )
-
-        model = LinearRegression()
-        model.fit(X=X_train, y=y_train)
-
-        return (
-            float(model.score(X=X_test, y=y_test)),
-            float(
-                model.coef_ @ [*map(float, params.values())] + model.intercept_
+            return (
+                model.r_squared,
+                float(model.predict([
+                    self.get_point(get_predicate(key, value))
+                    for key, value in params.items()
+                ]))
             )
+
+        return get_flight('prediction').do(
+            (normalize_filters(params), get_generation()),
+            predict
         )
 
     def handle_prediction_prompt(self, update: Update, context: CCT) -> int:
@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Optional
+
+from telegram.ext import BasePersistence
+from telegram.ext.utils.types import ConversationDict
+
+from app.db import DB_URI
+
+
+STATE_URI = (
+    os.environ.get('STATE_URI')
+    or f'{os.path.dirname(DB_URI)}/state.db'
+)
+
+Data = dict[Any, Any]
+
+
+class SQLitePersistence(BasePersistence[Data, Data, Data]):
+    __slots__ = 'uri', 'cache', '_conn', '_lock'
+
+    def __init__(self, uri: str) -> None:
+        super().__init__(
+            store_user_data=True,
+            store_chat_data=True,
+            store_bot_data=True
+        )
+        self.uri = uri
+        self.cache: dict[tuple[str, str], str] = {}
+        self._conn = sqlite3.connect(
+            uri,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS state (
+                kind TEXT NOT NULL
+            ,   key TEXT NOT NULL
+            ,   value TEXT NOT NULL
+            ,   PRIMARY KEY (kind, key)
+            )
+        ''')
+        self._lock = threading.Lock()
+
+    def load(self, kind: str) -> dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, value FROM state WHERE kind = ?',
+                (kind,)
+            ).fetchall()
+
+        self.cache |= {(kind, key): value for key, value in rows}
+
+        return {key: json.loads(value) for key, value in rows}
+
+    def store(self, kind: str, key: str, data: Any) -> None:
+        if data is None:
+            value = None
+        else:
+            value = json.dumps(data, sort_keys=True)
+
+        with self._lock:
+            if self.cache.get((kind, key)) == value:
+                return
+
+            if value is None:
+                self._conn.execute(
+                    'DELETE FROM state WHERE kind = ? AND key = ?',
+                    (kind, key)
+                )
+                del self.cache[kind, key]
+            else:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO state VALUES (?, ?, ?)',
+                    (kind, key, value)
+                )
+                self.cache[kind, key] = value
+
+    def get_user_data(self) -> defaultdict[int, Data]:
+        return defaultdict(dict, {
+            int(key): data for key, data in self.load('user').items()
+        })
+
+    def get_chat_data(self) -> defaultdict[int, Data]:
+        return defaultdict(dict, {
+            int(key): data for key, data in self.load('chat').items()
+        })
+
+    def get_bot_data(self) -> Data:
+        data: Data = self.load('bot').get('', {})
+
+        return data
+
+    def get_conversations(self, name: str) -> ConversationDict:
+        return {
+            tuple(json.loads(key)): state
+            for key, state in self.load(f'conversation:{name}').items()
+        }
+
+    def update_conversation(
+        self,
+        name: str,
+        key: tuple[int, ...],
+        new_state: Optional[object]
+    ) -> None:
+        while isinstance(new_state, tuple):
+            new_state = new_state[0]
+
+        self.store(f'conversation:{name}', json.dumps(key), new_state)
+
+    def update_user_data(self, user_id: int, data: Data) -> None:
+        self.store('user', str(user_id), data)
+
+    def update_chat_data(self, chat_id: int, data: Data) -> None:
+        self.store('chat', str(chat_id), data)
+
+    def update_bot_data(self, data: Data) -> None:
+        self.store('bot', '', data)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_persistence() -> Optional[SQLitePersistence]:
+    global persistence
+
+    if os.environ.get('PERSISTENCE') != 'sqlite':
+        return None
+
+    with _lock:
+        if persistence is None:
+            persistence = SQLitePersistence(STATE_URI)
+
+    return persistence
+
+
+persistence: Optional[SQLitePersistence] = None
+_lock = threading.Lock()
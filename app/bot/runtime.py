@@ -0,0 +1,284 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from telegram import Bot as TelegramBot, Update
+from telegram.error import TelegramError
+
+from .types import DP
+
+
+MAX_HEADERS = 64
+MAX_BODY_BYTES = int(os.environ.get('WEBHOOK_MAX_BODY_BYTES', 2 ** 20))
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    413: 'Payload Too Large',
+    502: 'Bad Gateway'
+}
+
+Head = tuple[list[str], dict[str, str]]
+
+
+class RequestError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(REASONS[status])
+        self.status = status
+
+
+async def read_head(reader: asyncio.StreamReader) -> Optional[Head]:
+    line = await reader.readline()
+
+    if not line.strip():
+        return None
+
+    headers: dict[str, str] = {}
+
+    for _ in range(MAX_HEADERS + 1):
+        header = await reader.readline()
+
+        if not header.strip():
+            return line.decode('latin-1').split(' ', 2), headers
+
+        name, _, value = header.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    raise RequestError(400)
+
+
+async def read_body(
+    reader: asyncio.StreamReader,
+    headers: dict[str, str],
+    limit: Optional[int] = None
+) -> bytes:
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise RequestError(400)
+
+    if length < 0:
+        raise RequestError(400)
+
+    if limit is not None and length > limit:
+        raise RequestError(413)
+
+    return await reader.readexactly(length)
+
+
+async def read_message(
+    reader: asyncio.StreamReader
+) -> Optional[tuple[list[str], dict[str, str], bytes]]:
+    head = await read_head(reader)
+
+    if head is None:
+        return None
+
+    line, headers = head
+
+    return line, headers, await read_body(reader, headers)
+
+
+async def read_request(
+    reader: asyncio.StreamReader,
+    path: str
+) -> Optional[bytes]:
+    head = await read_head(reader)
+
+    if head is None:
+        return None
+
+    line, headers = head
+
+    if len(line) < 2:
+        raise RequestError(400)
+
+    if line[0] != 'POST' or line[1] != path:
+        raise RequestError(404)
+
+    return await read_body(reader, headers, MAX_BODY_BYTES)
+
+
+def write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: bytes = b''
+) -> None:
+    writer.write(
+        f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'Content-Type: application/json\r\n\r\n'.encode('latin-1') + body
+    )
+
+
+class AsyncRuntime:
+    __slots__ = (
+        'dispatcher', 'bot', 'max_pending', 'poll_timeout', 'lanes',
+        'executor', '_pending', '_stopping'
+    )
+
+    def __init__(
+        self,
+        dispatcher: DP,
+        max_pending: int = 256,
+        workers: int = 8,
+        poll_timeout: int = 10
+    ) -> None:
+        self.dispatcher = dispatcher
+        self.bot: TelegramBot = dispatcher.bot
+        self.max_pending = max_pending
+        self.poll_timeout = poll_timeout
+        self.lanes: dict[int, asyncio.Queue[Update]] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix='handler'
+        )
+        self._pending: Optional[asyncio.Semaphore] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    def get_lane_key(self, update: Update) -> int:
+        if update.effective_chat is not None:
+            return int(update.effective_chat.id)
+
+        if update.effective_user is not None:
+            return int(update.effective_user.id)
+
+        return 0
+
+    async def process(self, key: int, lane: 'asyncio.Queue[Update]') -> None:
+        assert self._pending is not None
+        loop = asyncio.get_running_loop()
+
+        while not lane.empty():
+            update = lane.get_nowait()
+
+            try:
+                await loop.run_in_executor(
+                    self.executor,
+                    self.dispatcher.process_update,
+                    update
+                )
+            except Exception as ex:
+                logging.error(f'Update processing error: {ex}')
+            finally:
+                self._pending.release()
+
+        del self.lanes[key]
+
+    async def submit(self, update: Update) -> None:
+        assert self._pending is not None
+        await self._pending.acquire()
+        key = self.get_lane_key(update)
+        lane = self.lanes.get(key)
+
+        if lane is None:
+            lane = self.lanes[key] = asyncio.Queue()
+            lane.put_nowait(update)
+            asyncio.create_task(self.process(key, lane))
+        else:
+            lane.put_nowait(update)
+
+    async def poll(self) -> None:
+        loop = asyncio.get_running_loop()
+        offset: Optional[int] = None
+
+        await loop.run_in_executor(None, self.bot.delete_webhook)
+
+        while True:
+            try:
+                updates: list[Update] = await loop.run_in_executor(
+                    None,
+                    lambda: self.bot.get_updates(
+                        offset=offset,
+                        timeout=self.poll_timeout
+                    )
+                )
+            except TelegramError as ex:
+                logging.error(f'Polling error: {ex}')
+                await asyncio.sleep(1)
+
+                continue
+
+            for update in updates:
+                offset = update.update_id + 1
+                await self.submit(update)
+
+    async def handle_webhook(
+        self,
+        path: str,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while (body := await read_request(reader, path)) is not None:
+                update = Update.de_json(json.loads(body), self.bot)
+
+                if update is not None:
+                    await self.submit(update)
+
+                write_response(writer, 200)
+                await writer.drain()
+        except RequestError as ex:
+            write_response(writer, ex.status)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as ex:
+            logging.error(f'Webhook error: {ex}')
+        except asyncio.CancelledError:
+            pass
+        finally:
+            writer.close()
+
+    async def listen(self, host: str, port: int, path: str) -> None:
+        server = await asyncio.start_server(
+            functools.partial(self.handle_webhook, path),
+            host,
+            port
+        )
+
+        async with server:
+            await server.serve_forever()
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(
+        self,
+        handle_signals: bool = True,
+        webhook: Optional[tuple[str, int, str]] = None
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        self._pending = asyncio.Semaphore(self.max_pending)
+        self._stopping = asyncio.Event()
+
+        if handle_signals:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, self.stop)
+
+        ready = threading.Event()
+        dispatching = threading.Thread(
+            target=self.dispatcher.start,
+            kwargs=dict(ready=ready),
+            name='dispatcher',
+            daemon=True
+        )
+        dispatching.start()
+        await loop.run_in_executor(None, ready.wait)
+
+        source = asyncio.create_task(
+            self.poll() if webhook is None else self.listen(*webhook)
+        )
+        await self._stopping.wait()
+        source.cancel()
+
+        while self.lanes:
+            await asyncio.sleep(0.1)
+
+        self.executor.shutdown()
+        await loop.run_in_executor(None, self.dispatcher.stop)
+        dispatching.join()
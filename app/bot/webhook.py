@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Any, Optional
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from app.db.sync import apply_changes
+from app.metrics import serve
+from .runtime import (
+    REASONS,
+    AsyncRuntime,
+    RequestError,
+    read_message,
+    read_request,
+    write_response
+)
+from .types import CCT
+
+if TYPE_CHECKING:
+    from . import Bot
+
+
+Connection = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def get_sender_id(update: Any) -> int:
+    if not isinstance(update, dict):
+        raise ValueError('Update is not a JSON object.')
+
+    for value in update.values():
+        if isinstance(value, dict):
+            sender = (
+                value.get('from') or value.get('chat')
+                or value.get('user') or {}
+            )
+
+            if not isinstance(sender, dict):
+                raise ValueError('Update sender is not a JSON object.')
+
+            try:
+                return int(sender.get('id', 0))
+            except TypeError:
+                raise ValueError('Update sender id is not a number.')
+
+    return 0
+
+
+def get_status(line: list[str]) -> Optional[int]:
+    if len(line) < 2 or not line[1].isdigit():
+        return None
+
+    status = int(line[1])
+
+    return status if status in REASONS else None
+
+
+def sync_changes(update: Update, context: CCT) -> None:
+    apply_changes()
+
+
+class StickyBalancer:
+    __slots__ = 'path', 'workers', 'idle', '_stopping'
+
+    def __init__(self, path: str, workers: list[tuple[str, int]]) -> None:
+        self.path = path
+        self.workers = workers
+        self.idle: list[list[Connection]] = [[] for _ in workers]
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def forward(self, index: int, body: bytes) -> int:
+        for attempt in range(2):
+            idle = self.idle[index]
+            reader, writer = (
+                idle.pop() if idle and not attempt
+                else await asyncio.open_connection(*self.workers[index])
+            )
+
+            try:
+                writer.write(
+                    f'POST {self.path} HTTP/1.1\r\n'
+                    f'Content-Length: {len(body)}\r\n'
+                    f'Content-Type: application/json\r\n\r\n'
+                    .encode('latin-1') + body
+                )
+                await writer.drain()
+                response = await read_message(reader)
+            except (OSError, asyncio.IncompleteReadError, RequestError):
+                response = None
+
+            status = None if response is None else get_status(response[0])
+
+            if status is not None:
+                idle.append((reader, writer))
+
+                return status
+
+            writer.close()
+
+        return 502
+
+    async def handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while (body := await read_request(reader, self.path)) is not None:
+                try:
+                    index = get_sender_id(json.loads(body)) % len(
+                        self.workers
+                    )
+                except ValueError:
+                    status = 400
+                else:
+                    try:
+                        status = await self.forward(index, body)
+                    except OSError as ex:
+                        logging.error(f'Worker {index} is down: {ex}')
+                        status = 502
+
+                write_response(writer, status)
+                await writer.drain()
+        except RequestError as ex:
+            write_response(writer, ex.status)
+        except (
+            OSError,
+            asyncio.IncompleteReadError,
+            asyncio.CancelledError,
+            ValueError
+        ):
+            pass
+        finally:
+            writer.close()
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self, host: str, port: int) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop)
+
+        server = await asyncio.start_server(self.handle, host, port)
+
+        async with server:
+            await self._stopping.wait()
+
+
+def run_worker(index: int, port: int, path: str) -> None:
+    from . import Bot
+
+    apply_changes()
+    bot = Bot(primary=False)
+    bot.dispatcher.add_handler(TypeHandler(Update, sync_changes), group=-1)
+
+    if os.environ.get('METRICS_PORT'):
+        serve(
+            os.environ.get('METRICS_HOST', '127.0.0.1'),
+            int(os.environ['METRICS_PORT']) + 1 + index
+        )
+
+    try:
+        asyncio.run(AsyncRuntime(
+            bot.dispatcher,
+            max_pending=int(os.environ.get('MAX_PENDING_UPDATES', 256)),
+            workers=int(os.environ.get('HANDLER_WORKERS', 8))
+        ).run(webhook=('127.0.0.1', port, path)))
+    finally:
+        from app.charts import renderer
+
+        if renderer is not None:
+            renderer.shutdown()
+
+
+def start_workers(port: int, path: str, count: int) -> list[BaseProcess]:
+    os.environ['PERSISTENCE'] = 'sqlite'
+    context = multiprocessing.get_context('spawn')
+    processes: list[BaseProcess] = [
+        context.Process(
+            target=run_worker,
+            args=(index, port + 1 + index, path),
+            name=f'webhook-worker-{index}'
+        )
+        for index in range(count)
+    ]
+
+    for process in processes:
+        process.start()
+
+    return processes
+
+
+def run_cluster(bot: 'Bot') -> None:
+    token = bot.dispatcher.bot.token
+    path = f'/{token}'
+    port = int(os.environ.get('WEBHOOK_PORT', 8443))
+    count = int(os.environ.get('WEBHOOK_WORKERS', os.cpu_count() or 1))
+    processes = start_workers(port, path, count)
+
+    if os.environ.get('WEBHOOK_URL'):
+        bot.dispatcher.bot.set_webhook(
+            url=os.environ['WEBHOOK_URL'].rstrip('/') + path
+        )
+
+    try:
+        asyncio.run(StickyBalancer(
+            path,
+            [('127.0.0.1', port + 1 + index) for index in range(count)]
+        ).run(os.environ.get('WEBHOOK_LISTEN', '0.0.0.0'), port))
+    finally:
+        for process in processes:
+            process.terminate()
+
+        for process in processes:
+            process.join()
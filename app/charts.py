@@ -0,0 +1,229 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from app.db.sync import Record, get_version, subscribe
+from app.metrics import gauge
+
+
+LABEL_SIZE = 25
+
+Values = npt.NDArray[Any]
+Prices = npt.NDArray[np.float64]
+Chart = tuple[str, Values, Prices]
+
+
+def render_chart(label: str, x: Values, y: Prices) -> bytes:
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(15, 15))
+    axes = figure.subplots()
+    axes.set_xlabel(label, fontsize=LABEL_SIZE)
+    axes.set_ylabel('sale price', fontsize=LABEL_SIZE)
+    axes.tick_params(labelsize=LABEL_SIZE)
+    axes.hexbin(x=x, y=y, gridsize=50, cmap='coolwarm')
+
+    image_io = BytesIO()
+    figure.savefig(image_io)
+
+    return image_io.getvalue()
+
+
+class ChartRenderer:
+    __slots__ = (
+        'workers', 'queue_depth', 'waiting', '_limit', '_executor', '_lock'
+    )
+
+    def __init__(self, workers: int, concurrency: int) -> None:
+        self.workers = workers
+        self.queue_depth = gauge(
+            'chart_queue_depth',
+            'Charts submitted for rendering and not finished yet'
+        )
+        self.waiting = gauge(
+            'chart_requests_waiting',
+            'Chart requests waiting for a free rendering slot'
+        )
+        self._limit = threading.BoundedSemaphore(concurrency)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+
+        return self._executor
+
+    def on_done(self, future: 'Future[bytes]') -> None:
+        self.queue_depth.dec()
+
+    def submit(self, chart: Chart) -> 'Future[bytes]':
+        future = self.get_executor().submit(render_chart, *chart)
+        self.queue_depth.inc()
+        future.add_done_callback(self.on_done)
+
+        return future
+
+    def render(self, charts: list[Chart]) -> list[bytes]:
+        self.waiting.inc()
+
+        with self._limit:
+            self.waiting.dec()
+            futures = [self.submit(chart) for chart in charts]
+
+            return [future.result() for future in futures]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+class ChartCache:
+    __slots__ = (
+        'max_bytes', 'spill_dir', 'version', 'entries', 'size', '_lock'
+    )
+
+    def __init__(self, max_bytes: int, spill_dir: Optional[str]) -> None:
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.version = get_version()
+        self.entries: OrderedDict[str, bytes] = OrderedDict()
+        self.size = 0
+        self._lock = threading.Lock()
+
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    def drop(self, keep: Optional[str]) -> None:
+        self.entries.clear()
+        self.size = 0
+
+        if self.spill_dir is not None:
+            for path in self.spill_dir.glob('*.png'):
+                if keep is None or not path.name.startswith(keep):
+                    path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.drop(keep=None)
+
+    def invalidate(self) -> None:
+        version = get_version()
+
+        with self._lock:
+            self.version = version
+            self.drop(keep=f'{version}-')
+
+    def on_insert(self, records: list[Record]) -> None:
+        self.invalidate()
+
+    def get_path(self, version: int, digest: str) -> Path:
+        assert self.spill_dir is not None
+
+        return self.spill_dir / f'{version}-{digest}.png'
+
+    def get_digest(self, key: Hashable) -> str:
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        digest = self.get_digest(key)
+
+        with self._lock:
+            image = self.entries.get(digest)
+            version = self.version
+
+            if image is not None:
+                self.entries.move_to_end(digest)
+
+                return image
+
+        if self.spill_dir is not None:
+            path = self.get_path(version, digest)
+
+            if path.exists():
+                image = path.read_bytes()
+                self.put(key, image, version)
+
+                return image
+
+        return None
+
+    def put(
+        self,
+        key: Hashable,
+        image: bytes,
+        version: Optional[int] = None
+    ) -> None:
+        digest = self.get_digest(key)
+        evicted: list[tuple[str, bytes]] = []
+
+        with self._lock:
+            if digest in self.entries or version not in (None, self.version):
+                return
+
+            version = self.version
+            self.entries[digest] = image
+            self.size += len(image)
+
+            while self.size > self.max_bytes:
+                evicted.append(self.entries.popitem(last=False))
+                self.size -= len(evicted[-1][1])
+
+        if self.spill_dir is not None:
+            for evicted_digest, evicted_image in evicted:
+                path = self.get_path(version, evicted_digest)
+
+                if not path.exists():
+                    path.write_bytes(evicted_image)
+
+
+def get_renderer() -> ChartRenderer:
+    global renderer
+
+    with _lock:
+        if renderer is None:
+            renderer = ChartRenderer(
+                workers=int(
+                    os.environ.get('CHART_WORKERS', os.cpu_count() or 1)
+                ),
+                concurrency=int(os.environ.get('CHART_CONCURRENCY', 2))
+            )
+
+    return renderer
+
+
+def get_cache() -> ChartCache:
+    global cache
+
+    with _lock:
+        if cache is None:
+            cache = ChartCache(
+                max_bytes=int(
+                    os.environ.get('CHART_CACHE_BYTES', 64 * 2 ** 20)
+                ),
+                spill_dir=os.environ.get('CHART_CACHE_DIR')
+            )
+            subscribe(cache.on_insert, cache.invalidate)
+
+    return cache
+
+
+renderer: Optional[ChartRenderer] = None
+cache: Optional[ChartCache] = None
+_lock = threading.Lock()
@@ -0,0 +1,69 @@
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+from app.metrics import counter
+
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    __slots__ = 'name', 'calls', 'executions', 'hits', '_lock'
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls: dict[Hashable, 'Future[Any]'] = {}
+        self.executions = counter(
+            'coalesce_executions_total',
+            'Computations run by the first caller of a key',
+            operation=name
+        )
+        self.hits = counter(
+            'coalesce_hits_total',
+            'Callers that joined an identical in-flight computation',
+            operation=name
+        )
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        with self._lock:
+            future = self.calls.get(key)
+            leader = future is None
+
+            if future is None:
+                future = self.calls[key] = Future()
+
+        if not leader:
+            self.hits.inc()
+            shared: T = future.result()
+
+            return shared
+
+        self.executions.inc()
+
+        try:
+            result = function()
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self.calls[key]
+
+        return result
+
+
+def get_flight(name: str) -> SingleFlight:
+    with _lock:
+        if name not in flights:
+            flights[name] = SingleFlight(name)
+
+    return flights[name]
+
+
+flights: dict[str, SingleFlight] = {}
+_lock = threading.Lock()
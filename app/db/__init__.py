@@ -1,4 +1,7 @@
 import os
 
 
-DB_URI = f'{os.environ["PWD"]}/app/db/sqlite.db'
+DB_URI = os.environ.get(
+    'DB_URI',
+    f'{os.environ["PWD"]}/app/db/sqlite.db'
+)
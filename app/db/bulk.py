@@ -0,0 +1,110 @@
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from .filters import LIMITS, build_insert, check_value
+from .pool import pool
+from .sync import exclusive, get_last_row, notify_insert, record_change
+
+
+Rejects = list[tuple[int, str]]
+EXACT_FLOAT = 2 ** 53
+
+
+def to_int(value: Any) -> Optional[int]:
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    elif isinstance(value, (int, np.integer)):
+        return int(value)
+
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+
+    return int(number) if number.is_integer() else None
+
+
+def validate_records(
+    df: pd.DataFrame,
+    types: dict[str, str]
+) -> tuple[pd.DataFrame, Rejects]:
+    missing = [column for column in types if column not in df.columns]
+
+    if missing:
+        return df.iloc[:0], [
+            (i + 1, f'missing columns: {", ".join(missing)}')
+            for i in df.index
+        ]
+
+    df = df[[*types]].copy()
+    reasons = pd.Series('', index=df.index)
+
+    for column, column_type in types.items():
+        if column_type == 'TEXT':
+            values = df[column].astype('string').str.strip()
+            invalid = values.isna() | (values == '')
+            problem = 'empty'
+        else:
+            values = pd.to_numeric(df[column], errors='coerce')
+            invalid = values.isna()
+            problem = 'not a number'
+
+            if column_type == 'INT':
+                invalid |= values.notna() & (values % 1 != 0)
+                problem = 'not an integer'
+                inexact = ~invalid & ~values.between(
+                    -EXACT_FLOAT, EXACT_FLOAT
+                )
+
+                if inexact.any():
+                    exact = pd.Series(
+                        [to_int(value) for value in df.loc[inexact, column]],
+                        index=df.index[inexact],
+                        dtype=object
+                    )
+                    out_of_range = exact.map(
+                        lambda value: check_value('INT', value) is not None
+                    ).reindex(df.index, fill_value=False)
+                    values = values.astype(object).mask(inexact, exact)
+                else:
+                    out_of_range = inexact
+            else:
+                low, high = LIMITS[column_type]
+                out_of_range = ~invalid & ~values.between(low, high)
+
+            reasons[out_of_range] += f'{column} is out of range; '
+
+        df[column] = values
+        reasons[invalid] += f'{column} is {problem}; '
+
+    valid = reasons == ''
+    rejects = [
+        (i + 1, reason.rstrip('; '))
+        for i, reason in reasons[~valid].items()
+    ]
+
+    return df[valid].astype({
+        column: 'int64' for column, column_type in types.items()
+        if column_type == 'INT'
+    }), rejects
+
+
+def insert_records(df: pd.DataFrame) -> int:
+    columns = [*df.columns]
+    rows = [*zip(*(df[column].tolist() for column in columns))]
+
+    with exclusive():
+        with pool.write() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            after = get_last_row(conn)
+            conn.executemany(build_insert(columns), rows)
+            record_change(conn, after)
+
+        notify_insert([dict(zip(columns, row)) for row in rows])
+
+    return len(rows)
@@ -0,0 +1,343 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, Literal, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from .filters import COMPARISONS, Predicate, get_predicate
+from .sync import Record, exclusive, read_snapshot, subscribe
+from .utils import get_columns_types, parse_value
+
+
+Rows = npt.NDArray[np.int64]
+Column = npt.NDArray[Any]
+Mask = npt.NDArray['np.bool_[Any]']
+
+
+class FilterCache:
+    __slots__ = (
+        'max_entries', 'max_rows', 'entries', 'rows', 'hits', 'misses',
+        '_lock'
+    )
+
+    def __init__(self, max_entries: int, max_rows: int) -> None:
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.entries: OrderedDict[Hashable, Rows] = OrderedDict()
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Rows]:
+        with self._lock:
+            rows = self.entries.get(key)
+
+            if rows is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+
+            return rows
+
+    def put(self, key: Hashable, rows: Rows) -> None:
+        with self._lock:
+            if key in self.entries:
+                return
+
+            self.entries[key] = rows
+            self.rows += len(rows)
+
+            while self.entries and (
+                len(self.entries) > self.max_entries
+                or self.rows > self.max_rows
+            ):
+                self.rows -= len(self.entries.popitem(last=False)[1])
+
+
+class ColumnarEngine:
+    __slots__ = (
+        'types', 'columns', 'dictionaries', 'codes', 'sorted', 'size',
+        'version', 'cache', 'stale', '_lock'
+    )
+
+    def __init__(self) -> None:
+        self.types: dict[str, str] = {}
+        self.columns: dict[str, Column] = {}
+        self.dictionaries: dict[str, list[str]] = {}
+        self.codes: dict[str, dict[str, int]] = {}
+        self.sorted: dict[str, tuple[int, Rows, Column]] = {}
+        self.size = 0
+        self.version = 0
+        self.cache = FilterCache(
+            max_entries=int(os.environ.get('FILTER_CACHE_ENTRIES', 1024)),
+            max_rows=int(os.environ.get('FILTER_CACHE_ROWS', 10 ** 7))
+        )
+        self.stale = True
+        self._lock = threading.RLock()
+
+    def load(self) -> None:
+        types = get_columns_types()
+
+        with exclusive():
+            rows: list[tuple[Any, ...]] = read_snapshot(
+                lambda conn: conn.execute(
+                    f'SELECT {", ".join(types)} FROM data ORDER BY rowid'
+                ).fetchall()
+            )
+
+            with self._lock:
+                self.types = types
+                self.stale = False
+                self.columns = {}
+                self.dictionaries = {}
+                self.codes = {}
+                self.sorted = {}
+                self.size = 0
+                self.append([dict(zip(types, row)) for row in rows])
+
+    def encode(self, column: str, value: Any) -> int:
+        if value is None:
+            return -1
+
+        text = str(parse_value('TEXT', value))
+        codes = self.codes.setdefault(column, {})
+
+        if text not in codes:
+            codes[text] = len(codes)
+            self.dictionaries.setdefault(column, []).append(text)
+
+        return codes[text]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.stale = True
+
+    def insert(self, records: list[Record]) -> None:
+        with self._lock:
+            if not self.stale:
+                self.append(records)
+
+    def append(self, records: list[Record]) -> None:
+        with self._lock:
+            size = self.size + len(records)
+
+            for column, column_type in self.types.items():
+                values = [
+                    self.encode(column, record.get(column))
+                    if column_type == 'TEXT'
+                    else parse_value(column_type, record.get(column))
+                    for record in records
+                ]
+                array = self.columns.get(column)
+
+                if array is None or len(array) < size:
+                    grown = np.empty(
+                        max(size, 2 * self.size, 1024),
+                        dtype=np.int32 if column_type == 'TEXT'
+                        else np.float64
+                    )
+
+                    if array is not None:
+                        grown[:self.size] = array[:self.size]
+
+                    array = self.columns[column] = grown
+
+                array[self.size:size] = values
+
+            self.size = size
+            self.version += 1
+
+    def get_targets(self, predicate: Predicate) -> list[float]:
+        if self.types[predicate.column] == 'TEXT':
+            codes = self.codes.get(predicate.column, {})
+
+            return [
+                -2 if value is None else codes.get(str(value), -2)
+                for value in predicate.values
+            ]
+
+        return [
+            math.nan if value is None else float(value)
+            for value in predicate.values
+        ]
+
+    def get_sorted(self, column: str) -> tuple[Rows, Column]:
+        with self._lock:
+            entry = self.sorted.get(column)
+
+            if entry is None or entry[0] != self.version:
+                values = self.columns[column][:self.size]
+                order = np.argsort(values, kind='stable').astype(np.int64)
+                entry = self.sorted[column] = (
+                    self.version, order, values[order]
+                )
+
+        return entry[1], entry[2]
+
+    def search(self, predicate: Predicate, size: int) -> Rows:
+        order, values = self.get_sorted(predicate.column)
+        targets = [
+            target for target in self.get_targets(predicate)
+            if target == target
+        ]
+
+        if not targets or (
+            predicate.op != 'IN' and len(targets) < len(predicate.values)
+        ):
+            return np.empty(0, dtype=np.int64)
+
+        def find(target: float, side: Literal['left', 'right']) -> int:
+            return int(np.searchsorted(values, target, side=side))
+
+        end = find(math.inf, 'right')
+
+        if predicate.op in ('=', 'IN'):
+            bounds = [
+                (find(target, 'left'), find(target, 'right'))
+                for target in targets
+            ]
+        elif predicate.op == 'BETWEEN':
+            bounds = [(find(targets[0], 'left'), find(targets[1], 'right'))]
+        else:
+            bounds = [{
+                '>=': (find(targets[0], 'left'), end),
+                '>': (find(targets[0], 'right'), end),
+                '<=': (0, find(targets[0], 'right')),
+                '<': (0, find(targets[0], 'left'))
+            }[predicate.op]]
+
+        rows: Rows = np.sort(np.concatenate([
+            order[lo:hi] for lo, hi in bounds
+        ]))
+        below: Rows = rows[rows < size]
+
+        return below
+
+    def matches(self, predicate: Predicate, values: Column) -> Mask:
+        targets = self.get_targets(predicate)
+        mask: Mask
+
+        if predicate.op == 'IN':
+            mask = np.isin(values, targets)
+        elif predicate.op == 'BETWEEN':
+            mask = (values >= targets[0]) & (values <= targets[1])
+        else:
+            mask = COMPARISONS[predicate.op](values, targets[0])
+
+        return mask
+
+    def get_prefix(
+        self,
+        predicates: list[Predicate],
+        version: int,
+        size: int
+    ) -> tuple[int, Rows]:
+        for depth in range(len(predicates), 0, -1):
+            rows = self.cache.get((version, frozenset(predicates[:depth])))
+
+            if rows is not None:
+                return depth, rows
+
+        return 0, np.arange(size, dtype=np.int64)
+
+    def rows(self, filters: dict[str, str]) -> Rows:
+        with self._lock:
+            columns, size, version = self.columns, self.size, self.version
+
+        predicates = [
+            get_predicate(key, value) for key, value in filters.items()
+        ]
+        depth, rows = self.get_prefix(predicates, version, size)
+
+        for depth in range(depth + 1, len(predicates) + 1):
+            predicate = predicates[depth - 1]
+
+            if predicate.op != '=' and len(rows) == size:
+                rows = self.search(predicate, size)
+            else:
+                rows = rows[self.matches(
+                    predicate,
+                    columns[predicate.column][rows]
+                )]
+
+            self.cache.put((version, frozenset(predicates[:depth])), rows)
+
+        return rows
+
+    def count_and_avg(
+        self,
+        filters: dict[str, str]
+    ) -> tuple[int, Optional[float]]:
+        prices = self.columns['price_doc'][self.rows(filters)]
+        prices = prices[~np.isnan(prices)]
+
+        if not len(prices):
+            return 0, None
+
+        return len(prices), float(prices.mean())
+
+    def select(self, filters: dict[str, str]) -> list[tuple[Any, ...]]:
+        rows = self.rows(filters)
+
+        return [*zip(*(
+            self.decode(column, self.columns[column][rows])
+            for column in self.types
+        ))]
+
+    def page(
+        self,
+        filters: dict[str, str],
+        after: int,
+        limit: int
+    ) -> list[tuple[int, tuple[Any, ...]]]:
+        rows = self.rows(filters)
+        rows = rows[np.searchsorted(rows, after, side='right'):][:limit]
+
+        return [*zip(rows.tolist(), zip(*(
+            self.decode(column, self.columns[column][rows])
+            for column in self.types
+        )))]
+
+    def decode(self, column: str, values: Column) -> list[Any]:
+        if self.types[column] == 'TEXT':
+            dictionary = self.dictionaries.get(column, [])
+
+            return [
+                dictionary[code] if code >= 0 else None
+                for code in values.tolist()
+            ]
+
+        return [
+            None if value != value
+            else int(value)
+            if self.types[column] == 'INT' and value.is_integer()
+            else value
+            for value in values.tolist()
+        ]
+
+
+def get_engine() -> Optional[ColumnarEngine]:
+    global engine
+
+    if os.environ.get('COLUMNAR_ENGINE', '1') != '1':
+        return None
+
+    with _lock:
+        if engine is None:
+            engine = ColumnarEngine()
+            subscribe(engine.insert, engine.invalidate)
+
+        if engine.stale:
+            engine.load()
+
+    return engine
+
+
+engine: Optional[ColumnarEngine] = None
+_lock = threading.Lock()
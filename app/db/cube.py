@@ -0,0 +1,133 @@
+import threading
+from itertools import combinations
+from typing import Any, Optional, Union
+
+from .filters import Predicate, get_predicate
+from .sync import Record, exclusive, read_snapshot, subscribe
+from .utils import get_columns_types, parse_value
+
+
+CUBE_COLUMNS = ('num_room', 'material', 'state', 'product_type', 'sub_area')
+
+Cell = list[float]
+Grouping = dict[tuple[Union[float, str], ...], Cell]
+
+
+class AggregateCube:
+    __slots__ = 'types', 'groupings', 'stale', '_lock'
+
+    def __init__(self) -> None:
+        self.types: dict[str, str] = {}
+        self.groupings: dict[tuple[str, ...], Grouping] = {}
+        self.stale = True
+        self._lock = threading.Lock()
+
+    def build(self) -> None:
+        types = get_columns_types()
+
+        with exclusive():
+            rows: list[tuple[Any, ...]] = read_snapshot(
+                lambda conn: conn.execute(f'''
+                    SELECT
+                        {', '.join(CUBE_COLUMNS)}
+                    ,   count(price_doc)
+                    ,   total(price_doc)
+                    FROM data
+                    GROUP BY {', '.join(CUBE_COLUMNS)}
+                ''').fetchall()
+            )
+
+            with self._lock:
+                self.types = types
+                self.stale = False
+                self.groupings = {
+                    columns: {}
+                    for size in range(len(CUBE_COLUMNS) + 1)
+                    for columns in combinations(CUBE_COLUMNS, size)
+                }
+
+                for *values, count, total in rows:
+                    self.add(dict(zip(CUBE_COLUMNS, values)), count, total)
+
+    def add(self, record: Record, count: int, total: float) -> None:
+        values = {
+            column: parse_value(self.types[column], record.get(column))
+            for column in CUBE_COLUMNS
+        }
+
+        for columns, grouping in self.groupings.items():
+            cell = grouping.setdefault(
+                tuple(values[column] for column in columns),
+                [0, 0.0]
+            )
+            cell[0] += count
+            cell[1] += total
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.stale = True
+
+    def insert(self, records: list[Record]) -> None:
+        with self._lock:
+            if self.stale:
+                return
+
+            for record in records:
+                price = parse_value('REAL', record.get('price_doc'))
+
+                if price == price:
+                    self.add(record, 1, float(price))
+
+    def count_and_avg(
+        self,
+        filters: dict[str, str]
+    ) -> Optional[tuple[int, Optional[float]]]:
+        if not set(filters) <= set(CUBE_COLUMNS):
+            return None
+
+        columns = tuple(
+            column for column in CUBE_COLUMNS if column in filters
+        )
+        predicates = [
+            get_predicate(column, filters[column]) for column in columns
+        ]
+
+        with self._lock:
+            grouping = self.groupings[columns]
+
+            if all(predicate.op == '=' for predicate in predicates):
+                key: tuple[Any, ...] = tuple(
+                    predicate.values[0] for predicate in predicates
+                )
+                cells = [grouping.get(key, [0, 0.0])]
+            else:
+                cells = [
+                    cell for key, cell in grouping.items()
+                    if all(map(Predicate.matches, predicates, key))
+                ]
+
+            count = sum(cell[0] for cell in cells)
+            total = sum(cell[1] for cell in cells)
+
+        if not count:
+            return 0, None
+
+        return int(count), total / count
+
+
+def get_cube() -> AggregateCube:
+    global cube
+
+    with _lock:
+        if cube is None:
+            cube = AggregateCube()
+            subscribe(cube.insert, cube.invalidate)
+
+        if cube.stale:
+            cube.build()
+
+    return cube
+
+
+cube: Optional[AggregateCube] = None
+_lock = threading.Lock()
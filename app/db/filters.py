@@ -0,0 +1,196 @@
+import math
+import operator
+import sys
+from collections.abc import Callable, Iterable, Mapping
+from typing import Any, NamedTuple, Optional, Union
+
+from .utils import get_columns_types, parse_value
+
+
+Binding = Union[int, float, str, None]
+COMPARISONS: dict[str, Callable[[Any, Any], Any]] = {
+    '=': operator.eq,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt
+}
+LIMITS = {
+    'INT': (-2 ** 63, 2 ** 63 - 1),
+    'REAL': (-sys.float_info.max, sys.float_info.max)
+}
+
+
+class Predicate(NamedTuple):
+    column: str
+    op: str
+    values: tuple[Binding, ...]
+
+    @property
+    def sql(self) -> str:
+        if self.op == 'BETWEEN':
+            return f'{self.column} BETWEEN ? AND ?'
+        elif self.op == 'IN':
+            return f'{self.column} IN ({", ".join("?" * len(self.values))})'
+
+        return f'{self.column} {self.op} ?'
+
+    def matches(self, value: Any) -> bool:
+        if value is None or value != value:
+            return False
+        elif self.op == 'BETWEEN':
+            return bool(self.values[0] <= value <= self.values[1])
+        elif self.op == 'IN':
+            return value in self.values
+
+        return bool(COMPARISONS[self.op](value, self.values[0]))
+
+
+def bind(column: str, value: Any) -> Binding:
+    types = get_columns_types()
+
+    if column not in types:
+        raise ValueError(f'Unknown column: {column}.')
+
+    if value is None or value != value or str(value).strip() == '':
+        return None
+
+    parsed = parse_value(types[column], value)
+
+    if isinstance(parsed, float):
+        if math.isnan(parsed):
+            raise ValueError(f'{column} expects a number, got {value!r}.')
+        elif types[column] == 'INT' and parsed.is_integer():
+            return int(parsed)
+
+    return parsed
+
+
+def check_value(column_type: str, value: Binding) -> Optional[str]:
+    if value is None:
+        return 'empty'
+    elif column_type == 'TEXT':
+        return None
+    elif isinstance(value, str):
+        return 'not a number'
+    elif column_type == 'INT' and not float(value).is_integer():
+        return 'not an integer'
+    elif not LIMITS[column_type][0] <= value <= LIMITS[column_type][1]:
+        return 'out of range'
+
+    return None
+
+
+def validate_record(record: Mapping[str, Any]) -> list[Binding]:
+    types = get_columns_types()
+    bindings: list[Binding] = []
+
+    for column, value in record.items():
+        binding = bind(column, value)
+        problem = check_value(types[column], binding)
+
+        if problem is not None:
+            raise ValueError(f'{column} is {problem}.')
+
+        bindings.append(binding)
+
+    return bindings
+
+
+def bind_bound(column: str, value: str) -> Binding:
+    bound = bind(column, value)
+
+    if bound is None:
+        raise ValueError(f'{column} range bound is missing.')
+
+    return bound
+
+
+def parse_filter(column: str, text: str) -> Predicate:
+    types = get_columns_types()
+
+    if column not in types:
+        raise ValueError(f'Unknown column: {column}.')
+
+    text = text.strip()
+
+    if len(text) > 1 and text[0] == text[-1] and text[0] in '\'"':
+        return Predicate(column, '=', (bind(column, text),))
+
+    if types[column] != 'TEXT':
+        for op in ('>=', '<=', '>', '<'):
+            if text.startswith(op):
+                return Predicate(
+                    column, op, (bind_bound(column, text[len(op):]),)
+                )
+
+        if '..' in text:
+            low, high = (part.strip() for part in text.split('..', 1))
+
+            if not low:
+                return Predicate(column, '<=', (bind_bound(column, high),))
+            elif not high:
+                return Predicate(column, '>=', (bind_bound(column, low),))
+
+            bounds = bind_bound(column, low), bind_bound(column, high)
+
+            if bounds[0] > bounds[1]:
+                raise ValueError(f'{column} range {text} is empty.')
+
+            return Predicate(column, 'BETWEEN', bounds)
+
+    if ',' in text:
+        values = tuple(dict.fromkeys(
+            value for value in (bind(column, part) for part in text.split(','))
+            if value is not None
+        ))
+
+        if not values:
+            raise ValueError(f'{column} list {text!r} is empty.')
+
+        return Predicate(column, 'IN', values)
+
+    return Predicate(column, '=', (bind(column, text),))
+
+
+def get_predicate(column: str, value: Any) -> Predicate:
+    if isinstance(value, Predicate):
+        return value
+    elif isinstance(value, str):
+        return parse_filter(column, value)
+
+    return Predicate(column, '=', (bind(column, value),))
+
+
+def normalize_filters(filters: Mapping[str, Any]) -> tuple[Predicate, ...]:
+    return tuple(sorted(
+        (get_predicate(column, value) for column, value in filters.items()),
+        key=lambda predicate: predicate.column
+    ))
+
+
+def build_where(
+    filters: Mapping[str, Any],
+    *extra: Predicate
+) -> tuple[str, list[Binding]]:
+    predicates = [
+        *(get_predicate(column, value) for column, value in filters.items()),
+        *extra
+    ]
+
+    if not predicates:
+        return '', []
+
+    return (
+        'WHERE ' + ' AND '.join(predicate.sql for predicate in predicates),
+        [value for predicate in predicates for value in predicate.values]
+    )
+
+
+def build_insert(columns: Iterable[str]) -> str:
+    columns = [*columns]
+
+    return f'''
+        INSERT INTO data ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+    '''
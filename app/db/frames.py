@@ -0,0 +1,210 @@
+import sqlite3
+import threading
+from collections.abc import Sequence
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from .filters import Binding
+from .pool import pool
+from .sync import Record, exclusive, read_snapshot, subscribe
+from .utils import get_columns_types
+
+
+INT_DTYPES = ('int8', 'int16', 'int32')
+REAL_DTYPE = 'float64'
+
+
+def get_int_dtype(low: float, high: float, nullable: bool) -> str:
+    dtype = next(
+        (
+            dtype for dtype in INT_DTYPES
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max
+        ),
+        'int64'
+    )
+
+    return dtype.capitalize() if nullable else dtype
+
+
+def widen_int_dtype(dtype: str, values: Sequence[Any]) -> Optional[str]:
+    numbers = [
+        value for value in values
+        if isinstance(value, (int, float)) and value == value
+    ]
+
+    if not numbers:
+        return dtype
+
+    low, high = min(numbers), max(numbers)
+    info = np.iinfo(dtype.lower())
+
+    if info.min <= low and high <= info.max:
+        return dtype
+
+    if low < np.iinfo('int64').min or np.iinfo('int64').max < high:
+        return None
+
+    return get_int_dtype(low, high, dtype != dtype.lower())
+
+
+class FrameSchema:
+    __slots__ = 'types', 'ranges', 'nullable', 'categories', 'stale', '_lock'
+
+    def __init__(self) -> None:
+        self.types: dict[str, str] = {}
+        self.ranges: dict[str, list[float]] = {}
+        self.nullable: set[str] = set()
+        self.categories: dict[str, dict[str, None]] = {}
+        self.stale = True
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        types = get_columns_types()
+        numeric = [
+            column for column, column_type in types.items()
+            if column_type == 'INT'
+        ]
+
+        def read(
+            conn: sqlite3.Connection
+        ) -> tuple[tuple[Any, ...], dict[str, dict[str, None]]]:
+            row: tuple[Any, ...] = conn.execute(f'''
+                SELECT {', '.join(
+                    f'min({column}), max({column}), '
+                    f'count(*) - count({column})'
+                    for column in types
+                )}
+                FROM data
+            ''').fetchone()
+            categories = {
+                column: dict.fromkeys(
+                    distinct[0] for distinct in conn.execute(f'''
+                        SELECT DISTINCT {column}
+                        FROM data
+                        WHERE {column} IS NOT NULL
+                        ORDER BY {column}
+                    ''')
+                )
+                for column, column_type in types.items()
+                if column_type == 'TEXT'
+            }
+
+            return row, categories
+
+        with exclusive():
+            row, categories = read_snapshot(read)
+
+            with self._lock:
+                self.types = types
+                self.stale = False
+                self.ranges = {
+                    column: [row[3 * i] or 0, row[3 * i + 1] or 0]
+                    for i, column in enumerate(types) if column in numeric
+                }
+                self.nullable = {
+                    column for i, column in enumerate(types)
+                    if row[3 * i + 2]
+                }
+                self.categories = categories
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.stale = True
+
+    def insert(self, records: list[Record]) -> None:
+        with self._lock:
+            if self.stale:
+                return
+
+            for record in records:
+                for column, column_type in self.types.items():
+                    value = record.get(column)
+
+                    if value is None or value != value:
+                        self.nullable.add(column)
+                    elif column_type == 'TEXT':
+                        self.categories[column].setdefault(str(value))
+                    elif column_type == 'INT':
+                        bounds = self.ranges[column]
+                        bounds[0] = min(bounds[0], float(value))
+                        bounds[1] = max(bounds[1], float(value))
+
+    def get_dtype(self, column: str) -> Any:
+        with self._lock:
+            column_type = self.types.get(column)
+
+            if column_type == 'INT':
+                low, high = self.ranges[column]
+
+                return get_int_dtype(low, high, column in self.nullable)
+            elif column_type == 'REAL':
+                return REAL_DTYPE
+            elif column_type == 'TEXT':
+                return pd.CategoricalDtype([*self.categories[column]])
+
+        return None
+
+    def to_series(
+        self,
+        column: str,
+        values: Sequence[Any]
+    ) -> 'pd.Series[Any]':
+        dtype = self.get_dtype(column)
+
+        if isinstance(dtype, str) and dtype.lower() in INT_DTYPES:
+            dtype = widen_int_dtype(dtype, values)
+
+        if dtype is not None:
+            try:
+                series: 'pd.Series[Any]' = pd.Series(
+                    values, dtype=dtype, name=column
+                )
+            except (TypeError, ValueError, OverflowError):
+                pass
+            else:
+                if not isinstance(dtype, pd.CategoricalDtype) or (
+                    series.isna().sum() == sum(v is None for v in values)
+                ):
+                    return series
+
+        fallback: 'pd.Series[Any]' = pd.Series(values, name=column)
+
+        return fallback
+
+    def read_frame(
+        self,
+        sql: str,
+        params: Sequence[Binding] = ()
+    ) -> pd.DataFrame:
+        with pool.read() as conn:
+            cursor = conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+
+        return pd.DataFrame({
+            column: self.to_series(column, values)
+            for column, values in zip(
+                columns,
+                zip(*rows) if rows else [()] * len(columns)
+            )
+        })
+
+
+def get_frame_schema() -> FrameSchema:
+    global schema
+
+    with _lock:
+        if schema is None:
+            schema = FrameSchema()
+            subscribe(schema.insert, schema.invalidate)
+
+        if schema.stale:
+            schema.load()
+
+    return schema
+
+
+schema: Optional[FrameSchema] = None
+_lock = threading.Lock()
@@ -0,0 +1,153 @@
+import logging
+import threading
+from collections import Counter
+from collections.abc import Iterable, Sequence
+
+from .filters import Binding
+from .pool import pool
+from .sync import Record, subscribe
+
+
+def get_indexed_columns() -> set[tuple[str, ...]]:
+    with pool.read() as conn:
+        return {
+            tuple(
+                row[2] for row in
+                conn.execute(f'PRAGMA index_info({index[1]})')
+            )
+            for index in conn.execute('PRAGMA index_list(data)')
+        }
+
+
+def ensure_indexes(columns: Iterable[str]) -> None:
+    indexed = get_indexed_columns()
+    missing = [column for column in columns if (column,) not in indexed]
+
+    if not missing:
+        return
+
+    with pool.write() as conn:
+        for column in missing:
+            conn.execute(
+                f'CREATE INDEX idx_data_{column} ON data ({column})'
+            )
+
+        conn.execute('ANALYZE data')
+
+
+class IndexAdvisor:
+    __slots__ = 'shapes', 'distinct', 'epoch', '_lock'
+
+    def __init__(self) -> None:
+        self.shapes: Counter[tuple[str, ...]] = Counter()
+        self.distinct: dict[str, int] = {}
+        self.epoch = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.distinct.clear()
+            self.epoch += 1
+
+    def on_insert(self, records: list[Record]) -> None:
+        self.invalidate()
+
+    def explain(
+        self,
+        where_sql: str,
+        params: Sequence[Binding] = ()
+    ) -> list[str]:
+        with pool.read() as conn:
+            return [
+                row[3] for row in conn.execute(f'''
+                    EXPLAIN QUERY PLAN
+                    SELECT
+                        count(price_doc)
+                    ,   avg(price_doc)
+                    FROM data
+                    {where_sql}
+                ''', params)
+            ]
+
+    def observe(
+        self,
+        where_sql: str,
+        params: Sequence[Binding],
+        columns: Iterable[str]
+    ) -> None:
+        shape = tuple(sorted(columns))
+
+        with self._lock:
+            self.shapes[shape] += 1
+            first_seen = self.shapes[shape] == 1
+
+        if first_seen:
+            logging.info(
+                f'Query plan for filter shape {shape}: '
+                f'{"; ".join(self.explain(where_sql, params))}'
+            )
+            logging.info(f'Index advisor report:\n{self.report()}')
+
+    def get_distinct_count(self, column: str) -> int:
+        with self._lock:
+            if column in self.distinct:
+                return self.distinct[column]
+
+            epoch = self.epoch
+
+        with pool.read() as conn:
+            count: int = conn.execute(
+                f'SELECT count(DISTINCT {column}) FROM data'
+            ).fetchone()[0]
+
+        with self._lock:
+            if self.epoch == epoch:
+                self.distinct[column] = count
+
+        return count
+
+    def recommend(self, top: int = 3) -> list[tuple[str, ...]]:
+        indexed = get_indexed_columns()
+        recommended: list[tuple[str, ...]] = []
+
+        with self._lock:
+            shapes = self.shapes.most_common()
+
+        for shape, _ in shapes:
+            if len(shape) < 2:
+                continue
+
+            columns = tuple(sorted(
+                shape,
+                key=self.get_distinct_count,
+                reverse=True
+            ))
+
+            if any(index[:len(columns)] == columns for index in indexed):
+                continue
+
+            recommended.append(columns)
+
+            if len(recommended) == top:
+                break
+
+        return recommended
+
+    def report(self) -> str:
+        with self._lock:
+            shapes = self.shapes.most_common()
+
+        lines = [
+            f'{count} x {", ".join(shape)}' for shape, count in shapes
+        ]
+        lines += [
+            f'CREATE INDEX idx_data_{"_".join(columns)} '
+            f'ON data ({", ".join(columns)});'
+            for columns in self.recommend()
+        ]
+
+        return '\n'.join(lines)
+
+
+advisor = IndexAdvisor()
+subscribe(advisor.on_insert, advisor.invalidate)
@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+from app.metrics import stage
+from . import DB_URI
+
+
+class ConnectionPool:
+    __slots__ = (
+        'uri', 'cached_statements', '_local', '_connections',
+        '_writer', '_write_lock', '_lock'
+    )
+
+    def __init__(self, uri: str, cached_statements: int = 256) -> None:
+        self.uri = uri
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.uri,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+
+        with self._lock:
+            self._connections.append(conn)
+
+        return conn
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        conn: Optional[sqlite3.Connection] = getattr(
+            self._local, 'conn', None
+        )
+
+        if conn is None:
+            conn = self._local.conn = self.connect()
+            conn.execute('PRAGMA query_only = ON')
+
+        with stage('sql'):
+            yield conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self.connect()
+                self._writer.execute('PRAGMA synchronous = FULL')
+
+            with self._writer, stage('sql'):
+                yield self._writer
+
+    def close(self) -> None:
+        with self._write_lock, self._lock:
+            for conn in self._connections:
+                conn.close()
+
+            self._connections.clear()
+            self._writer = None
+            self._local = threading.local()
+
+
+pool = ConnectionPool(DB_URI)
@@ -0,0 +1,230 @@
+import math
+import os
+import sqlite3
+import threading
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from .filters import COMPARISONS, Predicate, get_predicate
+from .sync import Record, exclusive, read_snapshot, subscribe
+from .utils import get_columns_types, parse_value
+
+
+SAMPLE_SIZE = int(os.environ.get('SAMPLE_SIZE', 10_000))
+MIN_TABLE_ROWS = int(os.environ.get('APPROXIMATE_MIN_ROWS', 100_000))
+MIN_SAMPLE_ROWS = 100
+MAX_ERROR = float(os.environ.get('APPROXIMATE_MAX_ERROR', 0.05))
+Z_SCORE = 1.96
+
+Column = npt.NDArray[Any]
+Mask = npt.NDArray['np.bool_[Any]']
+
+
+class Estimate(NamedTuple):
+    records: int
+    records_error: float
+    avg: Optional[float]
+    avg_error: float
+    sample_rows: int
+
+    @property
+    def precise(self) -> bool:
+        return (
+            self.sample_rows >= MIN_SAMPLE_ROWS
+            and self.records_error <= MAX_ERROR * self.records
+            and self.avg is not None
+            and self.avg_error <= MAX_ERROR * abs(self.avg)
+        )
+
+
+class ReservoirSample:
+    __slots__ = (
+        'size', 'types', 'columns', 'filled', 'seen', 'rng', 'stale', '_lock'
+    )
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.types: dict[str, str] = {}
+        self.columns: dict[str, Column] = {}
+        self.filled = 0
+        self.seen = 0
+        self.rng = np.random.default_rng()
+        self.stale = True
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        types = get_columns_types()
+
+        def read(conn: sqlite3.Connection) -> tuple[int, list[Any]]:
+            return (
+                int(conn.execute('SELECT count(*) FROM data').fetchone()[0]),
+                conn.execute(f'''
+                    SELECT {', '.join(types)}
+                    FROM data
+                    ORDER BY random()
+                    LIMIT ?
+                ''', (self.size,)).fetchall()
+            )
+
+        with exclusive():
+            seen, rows = read_snapshot(read)
+
+            with self._lock:
+                self.types = types
+                self.stale = False
+                self.columns = {
+                    column: np.empty(
+                        self.size,
+                        dtype=object if column_type == 'TEXT' else np.float64
+                    )
+                    for column, column_type in types.items()
+                }
+                self.filled = 0
+                self.seen = seen
+
+                for row in rows:
+                    self.put(self.filled, dict(zip(types, row)))
+                    self.filled += 1
+
+    def put(self, slot: int, record: Record) -> None:
+        for column, column_type in self.types.items():
+            value = record.get(column)
+            self.columns[column][slot] = (
+                None if column_type == 'TEXT' and value is None
+                else parse_value(column_type, value)
+            )
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.stale = True
+
+    def insert(self, records: list[Record]) -> None:
+        with self._lock:
+            if self.stale:
+                return
+
+            for record in records:
+                self.seen += 1
+
+                if self.filled < self.size:
+                    self.put(self.filled, record)
+                    self.filled += 1
+                else:
+                    slot = int(self.rng.integers(self.seen))
+
+                    if slot < self.size:
+                        self.put(slot, record)
+
+    def matches(self, predicate: Predicate) -> Mask:
+        values = self.columns[predicate.column][:self.filled]
+        mask: Mask
+
+        if self.types[predicate.column] == 'TEXT':
+            mask = np.fromiter(
+                map(predicate.matches, values),
+                dtype=bool,
+                count=len(values)
+            )
+
+            return mask
+
+        targets = [
+            math.nan if value is None else float(value)
+            for value in predicate.values
+        ]
+
+        if predicate.op == 'IN':
+            mask = np.isin(values, targets)
+        elif predicate.op == 'BETWEEN':
+            mask = (values >= targets[0]) & (values <= targets[1])
+        else:
+            mask = COMPARISONS[predicate.op](values, targets[0])
+
+        return mask
+
+    def mask(self, filters: dict[str, str]) -> Mask:
+        mask = np.ones(self.filled, dtype=bool)
+
+        for column, value in filters.items():
+            mask &= self.matches(get_predicate(column, value))
+
+        return mask
+
+    def estimate(self, filters: dict[str, str]) -> Optional[Estimate]:
+        with self._lock:
+            if self.seen < MIN_TABLE_ROWS or not self.filled:
+                return None
+
+            prices = self.columns['price_doc'][:self.filled][
+                self.mask(filters)
+            ]
+            sampled, population = self.filled, self.seen
+
+        prices = prices[~np.isnan(prices)]
+        matched = len(prices)
+        share = matched / sampled
+        correction = (
+            (population - sampled) / (population - 1) if population > 1
+            else 0.0
+        )
+        records_error = Z_SCORE * population * math.sqrt(
+            share * (1 - share) / sampled * correction
+        )
+
+        if not matched:
+            return Estimate(0, records_error, None, math.inf, 0)
+
+        avg_error = Z_SCORE * float(prices.std(ddof=1)) * math.sqrt(
+            correction / matched
+        ) if matched > 1 else math.inf
+
+        return Estimate(
+            round(population * share),
+            records_error,
+            float(prices.mean()),
+            avg_error,
+            matched
+        )
+
+    def frame(
+        self,
+        filters: dict[str, str],
+        columns: list[str]
+    ) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if self.seen < MIN_TABLE_ROWS or not self.filled:
+                return None
+
+            mask = self.mask(filters)
+
+            if mask.sum() < MIN_SAMPLE_ROWS:
+                return None
+
+            return pd.DataFrame({
+                column: self.columns[column][:self.filled][mask]
+                for column in columns
+            })
+
+
+def get_sample() -> Optional[ReservoirSample]:
+    global sample
+
+    if os.environ.get('APPROXIMATE_QUERIES', '0') != '1':
+        return None
+
+    with _lock:
+        if sample is None:
+            sample = ReservoirSample(SAMPLE_SIZE)
+            subscribe(sample.insert, sample.invalidate)
+
+        if sample.stale:
+            sample.load()
+
+    return sample
+
+
+sample: Optional[ReservoirSample] = None
+_lock = threading.Lock()
@@ -0,0 +1,101 @@
+import logging
+import sqlite3
+import threading
+from typing import Optional
+
+from .pool import pool
+from .sync import record_change
+
+
+SPARES = ('pristine_a', 'pristine_b')
+
+
+def get_tables(conn: sqlite3.Connection) -> set[str]:
+    return {
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+
+
+def get_index_columns(
+    conn: sqlite3.Connection,
+    table: str
+) -> list[list[str]]:
+    return [
+        [
+            column[2] for column in
+            conn.execute(f'PRAGMA index_info({index[1]})')
+        ]
+        for index in conn.execute(f'PRAGMA index_list({table})')
+    ]
+
+
+def get_free_spare(conn: sqlite3.Connection) -> str:
+    used = {
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+
+    return next(
+        spare for spare in SPARES
+        if not any(name.startswith(f'idx_{spare}_') for name in used)
+    )
+
+
+def get_ready_spare(conn: sqlite3.Connection) -> Optional[str]:
+    tables = get_tables(conn)
+
+    return next((spare for spare in SPARES if spare in tables), None)
+
+
+def build_spare(conn: sqlite3.Connection) -> str:
+    spare = get_free_spare(conn)
+    conn.execute(f'DROP TABLE IF EXISTS {spare}')
+    conn.execute(f'CREATE TABLE {spare} AS SELECT * FROM original')
+
+    for columns in get_index_columns(conn, 'data'):
+        conn.execute(f'''
+            CREATE INDEX idx_{spare}_{'_'.join(columns)}
+            ON {spare} ({', '.join(columns)})
+        ''')
+
+    return spare
+
+
+def prepare_snapshot() -> None:
+    with pool.write() as conn:
+        conn.execute('DROP TABLE IF EXISTS data_old')
+
+        if get_ready_spare(conn) is None:
+            build_spare(conn)
+
+        conn.execute('ANALYZE data')
+
+
+def prepare_snapshot_in_background() -> None:
+    def prepare() -> None:
+        try:
+            prepare_snapshot()
+        except Exception as ex:
+            logging.error(f'Snapshot preparation error: {ex}')
+
+    threading.Thread(
+        target=prepare,
+        name='snapshot-preparation',
+        daemon=True
+    ).start()
+
+
+def restore_snapshot() -> None:
+    with pool.write() as conn:
+        conn.execute('DROP TABLE IF EXISTS data_old')
+        spare = get_ready_spare(conn) or build_spare(conn)
+
+        conn.execute('BEGIN')
+        conn.execute('ALTER TABLE data RENAME TO data_old')
+        conn.execute(f'ALTER TABLE {spare} RENAME TO data')
+        record_change(conn)
+
+    prepare_snapshot_in_background()
@@ -0,0 +1,184 @@
+import sqlite3
+import threading
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, Optional, TypeVar
+
+from .pool import pool
+
+
+CHANGES_KEPT = 1000
+ORIGIN = uuid.uuid4().hex
+
+Record = dict[str, Any]
+InsertListener = Callable[[list[Record]], None]
+ResetListener = Callable[[], None]
+T = TypeVar('T')
+
+_lock = threading.Lock()
+_generation = 0
+_insert_listeners: list[InsertListener] = []
+_reset_listeners: list[ResetListener] = []
+_data_lock = threading.RLock()
+_last_change = -1
+
+
+def get_generation() -> int:
+    return _generation
+
+
+def subscribe(on_insert: InsertListener, on_reset: ResetListener) -> None:
+    with _lock:
+        _insert_listeners.append(on_insert)
+        _reset_listeners.append(on_reset)
+
+
+@contextmanager
+def exclusive() -> Iterator[None]:
+    with _data_lock:
+        yield
+
+
+def bump_generation() -> None:
+    global _generation
+
+    with _lock:
+        _generation += 1
+
+
+def notify_insert(records: list[Record]) -> None:
+    bump_generation()
+
+    for listener in [*_insert_listeners]:
+        listener(records)
+
+
+def notify_reset() -> None:
+    bump_generation()
+
+    for listener in [*_reset_listeners]:
+        listener()
+
+
+def get_last_row(conn: sqlite3.Connection) -> int:
+    return int(
+        conn.execute('SELECT coalesce(max(rowid), 0) FROM data').fetchone()[0]
+    )
+
+
+def record_change(
+    conn: sqlite3.Connection,
+    after: Optional[int] = None
+) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT
+        ,   origin TEXT NOT NULL
+        ,   after_row INTEGER
+        ,   last_row INTEGER
+        )
+    ''')
+    change_id = conn.execute(
+        '''
+        INSERT INTO data_changes (origin, after_row, last_row)
+        VALUES (?, ?, ?)
+        ''',
+        (ORIGIN, after, None if after is None else get_last_row(conn))
+    ).lastrowid
+
+    if change_id is not None and change_id % CHANGES_KEPT == 0:
+        conn.execute(
+            'DELETE FROM data_changes WHERE id <= ?',
+            (change_id - CHANGES_KEPT,)
+        )
+
+
+def get_changes(after: int) -> list[tuple[int, str, Optional[int], int]]:
+    with pool.read() as conn:
+        try:
+            return conn.execute(
+                '''
+                SELECT id, origin, after_row, last_row
+                FROM data_changes
+                WHERE id > ?
+                ORDER BY id
+                ''',
+                (after,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+
+def read_version(conn: sqlite3.Connection) -> int:
+    try:
+        return int(conn.execute(
+            'SELECT coalesce(max(id), 0) FROM data_changes'
+        ).fetchone()[0])
+    except sqlite3.OperationalError:
+        return 0
+
+
+def get_version() -> int:
+    with pool.read() as conn:
+        return read_version(conn)
+
+
+def get_rows(after: int, last: int) -> list[Record]:
+    with pool.read() as conn:
+        cursor = conn.execute(
+            'SELECT * FROM data WHERE rowid > ? AND rowid <= ?',
+            (after, last)
+        )
+        columns = [column[0] for column in cursor.description]
+
+        return [dict(zip(columns, row)) for row in cursor]
+
+
+def apply_changes() -> None:
+    global _last_change
+
+    with _data_lock:
+        changes = get_changes(max(_last_change, 0))
+
+        if _last_change < 0:
+            _last_change = changes[-1][0] if changes else 0
+
+            return
+
+        foreign = [change for change in changes if change[1] != ORIGIN]
+
+        if changes:
+            missed = changes[0][0] > _last_change + 1
+            _last_change = changes[-1][0]
+        else:
+            missed = False
+
+        if missed or any(change[2] is None for change in foreign):
+            notify_reset()
+        else:
+            for _, _, after, last in foreign:
+                assert after is not None
+                records = get_rows(after, last)
+
+                if records:
+                    notify_insert(records)
+
+
+def read_snapshot(read: Callable[[sqlite3.Connection], T]) -> T:
+    with _data_lock:
+        while True:
+            if _last_change >= 0:
+                apply_changes()
+
+            with pool.read() as conn:
+                conn.execute('BEGIN')
+
+                try:
+                    version = read_version(conn)
+                    result = read(conn)
+                finally:
+                    conn.execute('COMMIT')
+
+            if _last_change < 0 or version == _last_change:
+                return result
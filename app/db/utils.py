@@ -1,11 +1,38 @@
-import sqlite3
+import math
+from functools import lru_cache
+from typing import Any, Union
 
-from . import DB_URI
+from .pool import pool
 
 
+@lru_cache(maxsize=None)
 def get_columns_meta() -> dict[str, str]:
-    with sqlite3.connect(DB_URI) as conn:
+    with pool.read() as conn:
         return {
             row[0]: row[1]
-            for row in conn.cursor().execute('SELECT * FROM meta')
+            for row in conn.execute('SELECT * FROM meta')
         }
+
+
+@lru_cache(maxsize=None)
+def get_columns_types() -> dict[str, str]:
+    with pool.read() as conn:
+        return {
+            row[1]: row[2].upper()
+            for row in conn.execute('PRAGMA table_info(data)')
+        }
+
+
+def parse_value(column_type: str, value: Any) -> Union[float, str]:
+    if column_type == 'TEXT':
+        text = str(value).strip()
+
+        if len(text) > 1 and text[0] == text[-1] and text[0] in '\'"':
+            text = text[1:-1].replace(text[0] * 2, text[0])
+
+        return text
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
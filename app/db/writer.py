@@ -0,0 +1,148 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from app.metrics import histogram
+from .filters import build_insert, validate_record
+from .pool import pool
+from .sync import (
+    Record,
+    exclusive,
+    get_last_row,
+    notify_insert,
+    record_change
+)
+
+
+Pending = tuple[Record, 'Future[None]', float]
+
+
+class GroupCommitWriter:
+    __slots__ = (
+        'max_batch', 'max_delay', 'queue', 'commit_latency', 'batch_size',
+        '_thread'
+    )
+
+    def __init__(self, max_batch: int, max_delay: float) -> None:
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue: queue.Queue[Pending] = queue.Queue()
+        self.commit_latency = histogram(
+            'insert_commit_seconds',
+            'Time from enqueueing an insert to its group commit',
+            [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1]
+        )
+        self.batch_size = histogram(
+            'insert_batch_size',
+            'Number of inserts committed together',
+            [1, 2, 4, 8, 16, 32, 64, 128, 256]
+        )
+        self._thread = threading.Thread(
+            target=self.run,
+            name='group-commit-writer',
+            daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, record: Record) -> 'Future[None]':
+        future: 'Future[None]' = Future()
+        self.queue.put((record, future, time.perf_counter()))
+
+        return future
+
+    def collect(self) -> list[Pending]:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_delay
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+
+            try:
+                batch.append(
+                    self.queue.get(timeout=timeout)
+                    if timeout > 0 else self.queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+
+        return batch
+
+    def commit(self, batch: list[Pending]) -> None:
+        committed: list[Pending] = []
+        written: list[Record] = []
+        failed: list[tuple[Pending, Exception]] = []
+
+        with exclusive():
+            try:
+                with pool.write() as conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    after = get_last_row(conn)
+
+                    for pending in batch:
+                        record = pending[0]
+                        conn.execute('SAVEPOINT record')
+
+                        try:
+                            bindings = validate_record(record)
+                            conn.execute(build_insert(record), bindings)
+                        except Exception as ex:
+                            conn.execute('ROLLBACK TO record')
+                            failed.append((pending, ex))
+                        else:
+                            committed.append(pending)
+                            written.append(dict(zip(record, bindings)))
+
+                        conn.execute('RELEASE record')
+
+                    if committed:
+                        record_change(conn, after)
+            except Exception as ex:
+                for _, future, _ in batch:
+                    future.set_exception(ex)
+
+                return
+
+            self.batch_size.observe(len(batch))
+
+            if committed:
+                try:
+                    notify_insert(written)
+                except Exception as ex:
+                    logging.error(f'Insert listener error: {ex}')
+
+        for (_, future, _), error in failed:
+            future.set_exception(error)
+
+        for _, future, enqueued_at in committed:
+            self.commit_latency.observe(time.perf_counter() - enqueued_at)
+            future.set_result(None)
+
+    def run(self) -> None:
+        while True:
+            batch = self.collect()
+
+            try:
+                self.commit(batch)
+            except Exception as ex:
+                logging.error(f'Group commit error: {ex}')
+
+
+def get_writer() -> GroupCommitWriter:
+    global writer
+
+    with _lock:
+        if writer is None:
+            writer = GroupCommitWriter(
+                max_batch=int(os.environ.get('INSERT_BATCH_SIZE', 256)),
+                max_delay=float(os.environ.get('INSERT_BATCH_DELAY', 0))
+            )
+
+    return writer
+
+
+writer: Optional[GroupCommitWriter] = None
+_lock = threading.Lock()
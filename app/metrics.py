@@ -0,0 +1,321 @@
+import bisect
+import logging
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ContextManager, Union
+
+
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+Labels = tuple[tuple[str, str], ...]
+
+
+class Gauge:
+    __slots__ = 'name', 'description', 'labels', 'value', '_lock'
+    kind = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Labels = ()
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def collect(self) -> list[tuple[str, Labels, float]]:
+        return [(self.name, self.labels, self.value)]
+
+
+class Counter(Gauge):
+    __slots__ = ()
+    kind = 'counter'
+
+    def inc(self, amount: float = 1) -> None:
+        if amount < 0:
+            raise ValueError('Counters can only be incremented.')
+
+        super().inc(amount)
+
+
+class Histogram:
+    __slots__ = (
+        'name', 'description', 'labels', 'buckets', 'counts', 'sum', '_lock'
+    )
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float],
+        labels: Labels = ()
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            counts = [*self.counts]
+
+        rank = q * sum(counts)
+        seen = 0
+
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+
+                lower = self.buckets[i - 1] if i else 0.0
+
+                return lower + (self.buckets[i] - lower) * (
+                    (rank - seen) / count
+                )
+
+            seen += count
+
+        return 0.0
+
+    def collect(self) -> list[tuple[str, Labels, float]]:
+        with self._lock:
+            counts = [*self.counts]
+            total = self.sum
+
+        samples: list[tuple[str, Labels, float]] = []
+        cumulative = 0
+
+        for bound, count in zip([*self.buckets, float('inf')], counts):
+            cumulative += count
+            samples.append((
+                f'{self.name}_bucket',
+                (*self.labels, ('le', format_number(bound))),
+                cumulative
+            ))
+
+        samples.append((f'{self.name}_sum', self.labels, total))
+        samples.append((f'{self.name}_count', self.labels, cumulative))
+
+        return samples
+
+
+Metric = Union[Gauge, Counter, Histogram]
+registry: dict[str, Metric] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            key,
+            value.replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n')
+        )
+        for key, value in labels
+    ) + '}'
+
+
+def gauge(name: str, description: str, **labels: str) -> Gauge:
+    key = name + format_labels(tuple(labels.items()))
+
+    with _lock:
+        metric = registry.get(key)
+
+        if metric is None:
+            metric = registry[key] = Gauge(
+                name, description, tuple(labels.items())
+            )
+
+    if not isinstance(metric, Gauge):
+        raise TypeError(f'Metric {key} is not a gauge.')
+
+    return metric
+
+
+def counter(name: str, description: str, **labels: str) -> Counter:
+    key = name + format_labels(tuple(labels.items()))
+
+    with _lock:
+        metric = registry.get(key)
+
+        if metric is None:
+            metric = registry[key] = Counter(
+                name, description, tuple(labels.items())
+            )
+
+    if not isinstance(metric, Counter):
+        raise TypeError(f'Metric {key} is not a counter.')
+
+    return metric
+
+
+def histogram(
+    name: str,
+    description: str,
+    buckets: Sequence[float],
+    **labels: str
+) -> Histogram:
+    key = name + format_labels(tuple(labels.items()))
+
+    with _lock:
+        metric = registry.get(key)
+
+        if metric is None:
+            metric = registry[key] = Histogram(
+                name, description, buckets, tuple(labels.items())
+            )
+
+    if not isinstance(metric, Histogram):
+        raise TypeError(f'Metric {key} is not a histogram.')
+
+    return metric
+
+
+def get_metrics(name: str) -> list[Metric]:
+    with _lock:
+        return [
+            metric for metric in registry.values() if metric.name == name
+        ]
+
+
+def get_context() -> dict[str, str]:
+    labels: dict[str, str] = getattr(_local, 'labels', {})
+
+    return labels
+
+
+@contextmanager
+def labelled(**labels: str) -> Iterator[None]:
+    previous = get_context()
+    _local.labels = labels
+
+    try:
+        yield
+    finally:
+        _local.labels = previous
+
+
+@contextmanager
+def timed(metric: Histogram) -> Iterator[None]:
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+
+def stage(name: str) -> ContextManager[None]:
+    return timed(histogram(
+        'stage_seconds',
+        'Time spent in a stage (sql, model, pandas, render) of a handler',
+        LATENCY_BUCKETS,
+        stage=name,
+        **get_context()
+    ))
+
+
+def sent(size: int) -> None:
+    counter(
+        'bytes_sent_total',
+        'Bytes of documents and photos sent to users',
+        **get_context()
+    ).inc(size)
+
+
+def render() -> str:
+    with _lock:
+        metrics = sorted(
+            registry.values(),
+            key=lambda metric: (metric.name, metric.labels)
+        )
+
+    lines: list[str] = []
+    described: set[str] = set()
+
+    for metric in metrics:
+        if metric.name not in described:
+            described.add(metric.name)
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+
+        lines.extend(
+            f'{name}{format_labels(labels)} {format_number(value)}'
+            for name, labels, value in metric.collect()
+        )
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+
+            return
+
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        logging.debug(format % args)
+
+
+def serve(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever,
+        name='metrics-server',
+        daemon=True
+    ).start()
+    logging.info(f'Serving metrics on http://{host}:{port}/metrics')
+
+    return server
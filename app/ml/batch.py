@@ -0,0 +1,73 @@
+import io
+import os
+from tempfile import SpooledTemporaryFile
+from typing import IO, Any
+
+import numpy as np
+import pandas as pd
+
+from .registry import FittedModel
+
+
+CHUNK_ROWS = int(os.environ.get('PREDICT_CHUNK_ROWS', 50_000))
+SPOOL_BYTES = int(os.environ.get('PREDICT_SPOOL_BYTES', 16 * 2 ** 20))
+EXCEL_OUTPUT_ROWS = int(os.environ.get('PREDICT_EXCEL_OUTPUT_ROWS', 10_000))
+FEATURE_DTYPE = np.float64
+
+
+class PredictionError(Exception):
+    pass
+
+
+def predict_frame(df: pd.DataFrame, model: FittedModel) -> pd.DataFrame:
+    try:
+        X = df[[*model.features]].to_numpy(dtype=FEATURE_DTYPE)
+    except (KeyError, TypeError, ValueError) as ex:
+        raise PredictionError(ex) from ex
+
+    df['price_mil'] = X @ model.coef + model.intercept
+
+    return df
+
+
+def predict_csv(
+    source: IO[bytes],
+    model: FittedModel
+) -> 'SpooledTemporaryFile[Any]':
+    output = SpooledTemporaryFile(max_size=SPOOL_BYTES)
+
+    with pd.read_csv(source, chunksize=CHUNK_ROWS) as reader:
+        for i, chunk in enumerate(reader):
+            output.write(
+                predict_frame(chunk, model).to_csv(header=i == 0).encode()
+            )
+
+    output.seek(0)
+
+    return output
+
+
+def predict_excel(
+    source: IO[bytes],
+    model: FittedModel
+) -> tuple[IO[bytes], str]:
+    df = predict_frame(pd.read_excel(source), model)
+
+    if len(df) > EXCEL_OUTPUT_ROWS:
+        output: IO[bytes] = SpooledTemporaryFile(max_size=SPOOL_BYTES)
+
+        for start in range(0, len(df), CHUNK_ROWS):
+            output.write(
+                df.iloc[start:start + CHUNK_ROWS]
+                .to_csv(header=start == 0).encode()
+            )
+
+        ext = 'csv'
+    else:
+        output = io.BytesIO()
+        df.to_excel(output)
+        ext = 'xlsx'
+
+    output.seek(0)
+
+    return output, ext
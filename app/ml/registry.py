@@ -0,0 +1,310 @@
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from collections.abc import Mapping, Sequence
+from typing import Any, NamedTuple, Optional, cast
+
+import numpy as np
+import numpy.typing as npt
+
+from app.db import DB_URI
+from app.metrics import stage
+from app.db.sync import Record, exclusive, read_snapshot, subscribe
+from app.db.utils import get_columns_types, parse_value
+
+
+Vector = npt.NDArray[np.float64]
+TEST_EVERY = 3
+ARTIFACT_VERSION = 1
+ARTIFACT_PATH = os.path.join(
+    os.path.dirname(DB_URI),
+    f'model.v{ARTIFACT_VERSION}.npz'
+)
+
+
+class FittedModel(NamedTuple):
+    features: tuple[str, ...]
+    intercept: float
+    coef: Vector
+    r_squared: float
+
+    def predict(self, X: Any) -> Vector:
+        prediction: Vector = (
+            np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+        )
+
+        return prediction
+
+
+class SufficientStats:
+    __slots__ = 'ZtZ', 'Zty', 'yty', 'n'
+
+    def __init__(self, size: int) -> None:
+        self.ZtZ = np.zeros((size + 1, size + 1))
+        self.Zty = np.zeros(size + 1)
+        self.yty = 0.0
+        self.n = 0
+
+    def update(self, X: Vector, y: Vector) -> None:
+        Z = np.ones((len(X), len(self.Zty)))
+        Z[:, 1:] = X
+        self.ZtZ += Z.T @ Z
+        self.Zty += Z.T @ y
+        self.yty += float(y @ y)
+        self.n += len(y)
+
+    def to_arrays(self, prefix: str) -> dict[str, npt.NDArray[Any]]:
+        return {
+            f'{prefix}_ZtZ': self.ZtZ,
+            f'{prefix}_Zty': self.Zty,
+            f'{prefix}_yty': np.array(self.yty),
+            f'{prefix}_n': np.array(self.n)
+        }
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: Mapping[str, npt.NDArray[Any]],
+        prefix: str
+    ) -> 'SufficientStats':
+        stats = cls(len(arrays[f'{prefix}_Zty']) - 1)
+        stats.ZtZ = arrays[f'{prefix}_ZtZ']
+        stats.Zty = arrays[f'{prefix}_Zty']
+        stats.yty = float(arrays[f'{prefix}_yty'])
+        stats.n = int(arrays[f'{prefix}_n'])
+
+        return stats
+
+    def __add__(self, other: 'SufficientStats') -> 'SufficientStats':
+        total = SufficientStats(len(self.Zty) - 1)
+        total.ZtZ = self.ZtZ + other.ZtZ
+        total.Zty = self.Zty + other.Zty
+        total.yty = self.yty + other.yty
+        total.n = self.n + other.n
+
+        return total
+
+    def fit(self, idx: list[int]) -> Vector:
+        beta = np.linalg.lstsq(
+            self.ZtZ[np.ix_(idx, idx)],
+            self.Zty[idx],
+            rcond=None
+        )[0]
+
+        return cast(Vector, beta)
+
+    def score(self, idx: list[int], beta: Vector) -> float:
+        if not self.n:
+            return float('nan')
+
+        sse = (
+            self.yty
+            - 2 * beta @ self.Zty[idx]
+            + beta @ self.ZtZ[np.ix_(idx, idx)] @ beta
+        )
+        sst = self.yty - self.Zty[0] ** 2 / self.n
+
+        return float(1 - sse / sst) if sst else float('nan')
+
+
+def get_fingerprint(conn: sqlite3.Connection, features: list[str]) -> str:
+    row: tuple[Any, ...] = conn.execute(f'''
+        SELECT
+            count(*)
+        ,   max(rowid)
+        ,   {', '.join(
+                f'total({column})'
+                for column in [*features, 'price_doc']
+            )}
+        FROM data
+    ''').fetchone()
+
+    return hashlib.sha256(repr(row).encode()).hexdigest()
+
+
+class ModelRegistry:
+    __slots__ = (
+        'features', 'train', 'test', 'rows', 'models', 'stale', '_lock'
+    )
+
+    def __init__(self) -> None:
+        self.features: list[str] = []
+        self.train = SufficientStats(0)
+        self.test = SufficientStats(0)
+        self.rows = 0
+        self.models: dict[tuple[tuple[str, ...], bool], FittedModel] = {}
+        self.stale = True
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        features = [
+            column for column, column_type in get_columns_types().items()
+            if column_type != 'TEXT' and column != 'price_doc'
+        ]
+
+        def read(
+            conn: sqlite3.Connection
+        ) -> tuple[str, Optional[list[tuple[Any, ...]]]]:
+            fingerprint = get_fingerprint(conn, features)
+
+            with self._lock:
+                if self.restore(features, fingerprint):
+                    return fingerprint, None
+
+            return fingerprint, conn.execute(f'''
+                SELECT {', '.join(features)}, price_doc
+                FROM data
+                ORDER BY rowid
+            ''').fetchall()
+
+        with exclusive():
+            fingerprint, rows = read_snapshot(read)
+
+            if rows is None:
+                return
+
+            with self._lock, stage('model'):
+                self.features = features
+                self.stale = False
+                self.train = SufficientStats(len(features))
+                self.test = SufficientStats(len(features))
+                self.rows = 0
+                self.update([
+                    dict(zip([*features, 'price_doc'], row)) for row in rows
+                ])
+                self.save(fingerprint)
+
+    def restore(self, features: list[str], fingerprint: str) -> bool:
+        try:
+            with np.load(ARTIFACT_PATH) as artifact:
+                if (
+                    int(artifact['version']) != ARTIFACT_VERSION
+                    or str(artifact['fingerprint']) != fingerprint
+                    or artifact['features'].tolist() != features
+                ):
+                    return False
+
+                self.features = features
+                self.train = SufficientStats.from_arrays(artifact, 'train')
+                self.test = SufficientStats.from_arrays(artifact, 'test')
+                self.rows = int(artifact['rows'])
+                self.models.clear()
+                self.stale = False
+        except FileNotFoundError:
+            return False
+        except Exception as ex:
+            logging.error(f'Model artifact load error: {ex}')
+
+            return False
+
+        logging.info(f'Model statistics restored from {ARTIFACT_PATH}')
+
+        return True
+
+    def save(self, fingerprint: str) -> None:
+        arrays: dict[str, Any] = {
+            'version': np.array(ARTIFACT_VERSION),
+            'fingerprint': np.array(fingerprint),
+            'features': np.array(self.features),
+            'rows': np.array(self.rows),
+            **self.train.to_arrays('train'),
+            **self.test.to_arrays('test')
+        }
+
+        try:
+            fd, path = tempfile.mkstemp(
+                suffix='.tmp',
+                prefix=f'{os.path.basename(ARTIFACT_PATH)}.',
+                dir=os.path.dirname(ARTIFACT_PATH) or None
+            )
+        except OSError as ex:
+            logging.error(f'Model artifact save error: {ex}')
+
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                np.savez(file, **arrays)
+
+            os.replace(path, ARTIFACT_PATH)
+        except OSError as ex:
+            logging.error(f'Model artifact save error: {ex}')
+
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+
+    def update(self, records: list[Record]) -> None:
+        data = np.array([
+            [
+                parse_value('REAL', record.get(column))
+                for column in [*self.features, 'price_doc']
+            ]
+            for record in records
+        ], dtype=np.float64).reshape(len(records), len(self.features) + 1)
+        is_test = (np.arange(len(data)) + self.rows) % TEST_EVERY == 0
+        valid = ~np.isnan(data).any(axis=1)
+        X, y = data[:, :-1], data[:, -1] / 10 ** 6
+        self.rows += len(data)
+
+        self.train.update(X[valid & ~is_test], y[valid & ~is_test])
+        self.test.update(X[valid & is_test], y[valid & is_test])
+        self.models.clear()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.stale = True
+
+    def insert(self, records: list[Record]) -> None:
+        with self._lock:
+            if not self.stale:
+                self.update(records)
+
+    def get(
+        self,
+        features: Sequence[str],
+        holdout: bool = True
+    ) -> FittedModel:
+        key = (tuple(features), holdout)
+
+        with self._lock:
+            model = self.models.get(key)
+
+            if model is None:
+                with stage('model'):
+                    idx = [
+                        0, *(self.features.index(f) + 1 for f in features)
+                    ]
+                    stats = self.train if holdout else self.train + self.test
+                    beta = stats.fit(idx)
+                    model = self.models[key] = FittedModel(
+                        features=key[0],
+                        intercept=float(beta[0]),
+                        coef=beta[1:],
+                        r_squared=(self.test if holdout else stats).score(
+                            idx, beta
+                        )
+                    )
+
+        return model
+
+
+def get_registry() -> ModelRegistry:
+    global registry
+
+    with _lock:
+        if registry is None:
+            registry = ModelRegistry()
+            subscribe(registry.insert, registry.invalidate)
+
+        if registry.stale:
+            registry.load()
+
+    return registry
+
+
+registry: Optional[ModelRegistry] = None
+_lock = threading.Lock()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from .suite import get_dataset
+
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+FILTERS: list[dict[str, str]] = [
+    {'full_sq': '>=40'},
+    {'build_year': '1960..2000'},
+    {'floor': '<=5', 'num_room': '1,2'},
+    {'full_sq': '30..80', 'state': '>=2'},
+    {'max_floor': '>9', 'material': '1'},
+    {'kitch_sq': '>=8', 'build_year': '>=1990'},
+    {'life_sq': '20..40', 'floor': '>3', 'num_room': '2'}
+]
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_URI'] = f'{tmp}/sqlite.db'
+        shutil.copyfile(get_dataset(ROWS), os.environ['DB_URI'])
+
+        from app.db.filters import build_where
+        from app.db.pool import pool
+        from app.db.sample import SAMPLE_SIZE, ReservoirSample
+
+        start = time.perf_counter()
+        sample = ReservoirSample(SAMPLE_SIZE)
+        sample.load()
+        print(
+            f'{ROWS:,} rows, sample of {SAMPLE_SIZE:,} loaded in '
+            f'{(time.perf_counter() - start) * 1000:.0f} ms'
+        )
+
+        covered = 0
+
+        for filters in FILTERS:
+            WHERE_SQL, bindings = build_where(filters)
+            start = time.perf_counter()
+
+            with pool.read() as conn:
+                count, avg_price = conn.execute(f'''
+                    SELECT count(price_doc), avg(price_doc)
+                    FROM data
+                    {WHERE_SQL}
+                ''', bindings).fetchone()
+
+            exact_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            estimate = sample.estimate(filters)
+            estimate_ms = (time.perf_counter() - start) * 1000
+            assert estimate is not None and estimate.avg is not None
+
+            covered += (
+                abs(estimate.records - count) <= estimate.records_error
+                and abs(estimate.avg - avg_price) <= estimate.avg_error
+            )
+            print(
+                f'{filters}: exact {exact_ms:.1f} ms, '
+                f'estimate {estimate_ms:.2f} ms, '
+                f'count {count} vs {estimate.records} '
+                f'± {estimate.records_error:.0f}, '
+                f'avg error {abs(estimate.avg / avg_price - 1):.2%} '
+                f'(± {estimate.avg_error / estimate.avg:.2%}), '
+                f'{"precise" if estimate.precise else "needs exact"}'
+            )
+
+        print(f'exact values inside the intervals: {covered}/{len(FILTERS)}')
+
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
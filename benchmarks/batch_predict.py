@@ -0,0 +1,126 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import IO, Any
+
+import numpy as np
+import pandas as pd
+
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+XLSX_ROWS = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+
+def measure(run: Callable[[], Any]) -> tuple[float, float]:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak / 2 ** 20
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_URI'] = f'{tmp}/sqlite.db'
+        shutil.copyfile(
+            f'{os.environ["PWD"]}/app/db/sqlite.db',
+            os.environ['DB_URI']
+        )
+
+        from app.db.pool import pool
+        from app.ml.batch import predict_csv, predict_excel
+        from app.ml.registry import get_registry
+
+        with pool.read() as conn:
+            sample = pd.read_sql_query('SELECT * FROM data', con=conn)
+
+        upload = f'{tmp}/upload.csv'
+        sheet = f'{tmp}/upload.xlsx'
+        rng = np.random.default_rng(42)
+        rows = sample.drop(columns='price_doc').iloc[
+            rng.integers(0, len(sample), ROWS)
+        ]
+        rows.to_csv(upload, index=False)
+        xlsx_rows = rows.iloc[:XLSX_ROWS]
+        xlsx_rows.to_excel(sheet, index=False)
+        model = get_registry().get(
+            [*get_registry().features],
+            holdout=False
+        )
+
+        def in_memory(path: str) -> None:
+            with open(path, 'rb') as source:
+                file = io.BytesIO(source.read())
+
+            if path.endswith('.csv'):
+                df = pd.read_csv(file)
+            else:
+                df = pd.read_excel(file)
+
+            df_predicted = pd.DataFrame(
+                model.predict(df[[*model.features]]),
+                columns=['price_mil']
+            )
+            df = pd.concat([df, df_predicted], axis=1)
+            output = io.BytesIO()
+
+            if path.endswith('.csv'):
+                df.to_csv(output)
+            else:
+                df.to_excel(output)
+
+        def predicted(path: str) -> tuple[IO[bytes], str]:
+            with open(path, 'rb') as source:
+                if path.endswith('.csv'):
+                    return predict_csv(source, model), 'csv'
+
+                return predict_excel(source, model)
+
+        def streamed(path: str) -> None:
+            predicted(path)[0].close()
+
+        def check_columns(path: str, count: int) -> None:
+            output, ext = predicted(path)
+
+            if ext == 'csv':
+                df = pd.read_csv(output, index_col=0)
+            else:
+                df = pd.read_excel(output, index_col=0)
+
+            output.close()
+            assert [*df.columns] == [*rows.columns, 'price_mil'], df.columns
+            assert len(df) == count
+
+        for path, count in ((upload, ROWS), (sheet, len(xlsx_rows))):
+            print(
+                f'{os.path.basename(path)}: {count:,} rows, '
+                f'{os.path.getsize(path) / 2 ** 20:.1f} MiB'
+            )
+            check_columns(path, count)
+
+            for name, predict in (
+                ('in-memory', in_memory),
+                ('streamed', streamed)
+            ):
+                elapsed, peak = measure(lambda: predict(path))
+                print(
+                    f'  {name}: {elapsed:.2f} s '
+                    f'({count / elapsed:,.0f} rows/s), '
+                    f'peak {peak:.1f} MiB'
+                )
+
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_URI'] = f'{tmp}/sqlite.db'
+        shutil.copyfile(
+            f'{os.environ["PWD"]}/app/db/sqlite.db',
+            os.environ['DB_URI']
+        )
+
+        from app.db.bulk import insert_records, validate_records
+        from app.db.pool import pool
+        from app.db.utils import get_columns_types
+        from app.db.writer import get_writer
+
+        types = get_columns_types()
+
+        with pool.read() as conn:
+            df = pd.read_sql_query(
+                f'SELECT * FROM data ORDER BY random() LIMIT {ROWS}',
+                con=conn
+            ).astype(str)
+
+        records: list[dict[str, str]] = df.to_dict('records')
+
+        def connect_per_row() -> None:
+            for record in records:
+                with sqlite3.connect(os.environ['DB_URI']) as conn:
+                    conn.cursor().execute(f'''
+                        INSERT INTO data ({', '.join(record.keys())})
+                        VALUES ('{"', '".join(
+                            value.replace("'", "''")
+                            for value in record.values()
+                        )}')
+                    ''')
+
+        def pool_per_row() -> None:
+            for record in records:
+                with pool.write() as conn:
+                    conn.execute(
+                        f'''
+                            INSERT INTO data ({', '.join(record.keys())})
+                            VALUES ({', '.join('?' * len(record))})
+                        ''',
+                        [*record.values()]
+                    )
+
+        def group_commit() -> None:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                [*executor.map(
+                    lambda record: get_writer().submit(record).result(),
+                    records
+                )]
+
+        def bulk() -> None:
+            valid, rejects = validate_records(df, types)
+            assert not rejects
+            insert_records(valid)
+
+        for name, run in (
+            ('connect per row', connect_per_row),
+            ('pool per row', pool_per_row),
+            ('group commit, 16 threads', group_commit),
+            ('bulk', bulk)
+        ):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            print(f'{name}: {ROWS / elapsed:,.0f} rows/s')
+
+        batch_size = get_writer().batch_size
+        print(
+            f'group commit: {batch_size.count} commits, '
+            f'{batch_size.sum / batch_size.count:.1f} rows/commit, '
+            f'{get_writer().commit_latency.sum / batch_size.sum * 1000:.2f} '
+            'ms mean commit latency'
+        )
+
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+FILTER_CHAINS = 2000
+
+
+def get_filter_chains(rows: list[tuple[Any, ...]]) -> list[dict[str, str]]:
+    rng = random.Random(42)
+    chains: list[dict[str, str]] = []
+
+    for _ in range(FILTER_CHAINS):
+        num_room, state, material, sub_area = rng.choice(rows)
+        filters = [
+            ('num_room', str(num_room)),
+            ('state', str(state)),
+            ('material', str(material)),
+            ('sub_area', "'" + sub_area.replace("'", "''") + "'")
+        ]
+        chains.append(dict(filters[:rng.randint(1, len(filters))]))
+
+    return chains
+
+
+def run(
+    count_and_avg: Callable[[dict[str, str]], Any],
+    chains: list[dict[str, str]]
+) -> float:
+    steps = [
+        dict([*filters.items()][:depth])
+        for filters in chains
+        for depth in range(1, len(filters) + 1)
+    ]
+    start = time.perf_counter()
+
+    for filters in steps:
+        count_and_avg(filters)
+
+    return (time.perf_counter() - start) / len(steps) * 10 ** 6
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_URI'] = f'{tmp}/sqlite.db'
+        shutil.copyfile(
+            f'{os.environ["PWD"]}/app/db/sqlite.db',
+            os.environ['DB_URI']
+        )
+
+        from app.db.columnar import ColumnarEngine, FilterCache
+        from app.db.cube import get_cube
+        from app.db.indexes import ensure_indexes
+        from app.db.pool import pool
+        from app.db.utils import get_columns_meta
+
+        ensure_indexes(get_columns_meta())
+
+        def sql_count_and_avg(filters: dict[str, str]) -> Any:
+            with pool.read() as conn:
+                return conn.execute(f'''
+                    SELECT
+                        count(price_doc)
+                    ,   avg(price_doc)
+                    FROM data
+                    WHERE {' AND '.join(
+                        f'{key} = {value}' for key, value in filters.items()
+                    )}
+                ''').fetchone()
+
+        with pool.read() as conn:
+            chains = get_filter_chains(conn.execute(
+                'SELECT num_room, state, material, sub_area FROM data'
+            ).fetchall())
+
+        start = time.perf_counter()
+        engine = ColumnarEngine()
+        engine.load()
+        print(f'engine load: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+        for filters in chains[:100]:
+            count, avg_price = sql_count_and_avg(filters)
+            engine_count, engine_avg_price = engine.count_and_avg(filters)
+            assert count == engine_count
+            assert abs(avg_price - engine_avg_price) < 10 ** -3
+
+        print(f'sqlite: {run(sql_count_and_avg, chains):.1f} us/step')
+        print(f'columnar: {run(engine.count_and_avg, chains):.1f} us/step')
+
+        print(f'cube: {run(get_cube().count_and_avg, chains):.1f} us/step')
+
+        engine.cache = FilterCache(max_entries=0, max_rows=0)
+        print(
+            'columnar without filter cache: '
+            f'{run(engine.count_and_avg, chains):.1f} us/step'
+        )
+
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+
+from app.db.pool import ConnectionPool
+
+
+SOURCE_DB = f'{os.environ["PWD"]}/app/db/sqlite.db'
+MESSAGES = 5000
+THREADS = 4
+SQL = '''
+    SELECT
+        count(price_doc)
+    ,   avg(price_doc)
+    FROM data
+    WHERE num_room = ?
+'''
+
+
+def per_message_connect(uri: str) -> Callable[[int], None]:
+    def handle(num_room: int) -> None:
+        with sqlite3.connect(uri) as conn:
+            conn.cursor().execute(SQL, (num_room,)).fetchone()
+
+    return handle
+
+
+def pooled(pool: ConnectionPool) -> Callable[[int], None]:
+    def handle(num_room: int) -> None:
+        with pool.read() as conn:
+            conn.execute(SQL, (num_room,)).fetchone()
+
+    return handle
+
+
+def run(handle: Callable[[int], None], threads: int) -> float:
+    rng = random.Random(42)
+    messages = [rng.randint(1, 5) for _ in range(MESSAGES)]
+    chunks = [messages[i::threads] for i in range(threads)]
+
+    def worker(chunk: list[int]) -> None:
+        for num_room in chunk:
+            handle(num_room)
+
+    workers = [
+        threading.Thread(target=worker, args=(chunk,)) for chunk in chunks
+    ]
+    start = time.perf_counter()
+
+    for thread in workers:
+        thread.start()
+
+    for thread in workers:
+        thread.join()
+
+    return MESSAGES / (time.perf_counter() - start)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f'{tmp}/sqlite.db'
+        shutil.copyfile(SOURCE_DB, uri)
+        pool = ConnectionPool(uri)
+
+        for threads in (1, THREADS):
+            baseline = run(per_message_connect(uri), threads)
+            candidate = run(pooled(pool), threads)
+            print(
+                f'threads={threads}: '
+                f'connect per message {baseline:,.0f} msg/s, '
+                f'pool {candidate:,.0f} msg/s '
+                f'(x{candidate / baseline:.2f})'
+            )
+
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
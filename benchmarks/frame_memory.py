@@ -0,0 +1,115 @@
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from typing import Any
+
+import pandas as pd
+
+from .suite import get_dataset
+
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+ROUNDS = 5
+
+OPERATIONS: dict[str, Callable[[pd.DataFrame], Any]] = {
+    'groupby sub_area mean': lambda df: df.groupby(
+        'sub_area', observed=True
+    )['price_doc'].mean(),
+    'filter num_room/state': lambda df: df.loc[
+        (df['num_room'] == 2) & (df['state'] >= 3), 'price_doc'
+    ].mean(),
+    'price per square meter': lambda df: (
+        df['price_doc'] / df['full_sq'].where(df['full_sq'] > 0)
+    ).median()
+}
+
+
+def timed(function: Callable[[], Any]) -> tuple[Any, float]:
+    timings: list[float] = []
+
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+
+    return result, statistics.median(timings) * 1000
+
+
+def check_insert_categories() -> None:
+    from app.db.frames import get_frame_schema
+    from app.db.writer import get_writer
+
+    schema = get_frame_schema()
+    get_writer().submit(
+        {'full_sq': ' 54 ', 'sub_area': " 'Novaja Zona' ", 'price_doc': '1'}
+    ).result()
+    inserted = schema.read_frame(
+        'SELECT full_sq, sub_area FROM data WHERE sub_area = ?',
+        ['Novaja Zona']
+    )
+
+    assert 'Novaja Zona' in schema.categories['sub_area']
+    assert isinstance(inserted['sub_area'].dtype, pd.CategoricalDtype)
+    assert inserted['sub_area'].tolist() == ['Novaja Zona']
+    assert inserted['full_sq'].tolist() == [54]
+    print('inserted text values are registered as normalized categories')
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_URI'] = f'{tmp}/sqlite.db'
+        shutil.copyfile(get_dataset(ROWS), os.environ['DB_URI'])
+
+        from app.db.frames import get_frame_schema
+        from app.db.pool import pool
+
+        schema = get_frame_schema()
+        frames: dict[str, pd.DataFrame] = {}
+
+        def read_generic() -> pd.DataFrame:
+            with pool.read() as conn:
+                return pd.read_sql_query('SELECT * FROM data', conn)
+
+        for name, read in (
+            ('generic', read_generic),
+            ('typed', lambda: schema.read_frame('SELECT * FROM data'))
+        ):
+            frames[name], elapsed = timed(read)
+            print(
+                f'{name}: {len(frames[name])} rows loaded in '
+                f'{elapsed:.0f} ms, '
+                f'{frames[name].memory_usage(deep=True).sum() / 2 ** 20:.1f} '
+                'MiB'
+            )
+
+        print(frames['typed'].dtypes.to_string())
+        print(
+            'memory ratio: {:.1f}x'.format(
+                frames['generic'].memory_usage(deep=True).sum()
+                / frames['typed'].memory_usage(deep=True).sum()
+            )
+        )
+
+        for operation, function in OPERATIONS.items():
+            results = {
+                name: timed(lambda: function(frame))
+                for name, frame in frames.items()
+            }
+            expected = pd.Series(results['generic'][0], dtype='float64')
+            actual = pd.Series(results['typed'][0], dtype='float64')
+            assert ((expected - actual).abs() <= expected.abs() * 1e-5).all()
+            print(
+                f'{operation}: generic {results["generic"][1]:.1f} ms, '
+                f'typed {results["typed"][1]:.1f} ms'
+            )
+
+        check_insert_categories()
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+import asyncio
+import io
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Union
+
+import pandas as pd
+
+
+TOKEN = '123456:load-test'
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+Step = Union[str, dict[str, str]]
+
+SCRIPTS: dict[str, list[Step]] = dict(
+    insert=[
+        '/insert',
+        '7500000',
+        '54,30,5,9,1,1975,2,8,3,Investment,Hamovniki',
+        'NO'
+    ],
+    query=[
+        '/query', 'num_room', '2', 'state', '3', '/charts',
+        '/query', 'num_room', '2', 'state', '3', '/csv'
+    ],
+    predict=['/predict', dict(file_name='upload.csv'), 'NO']
+)
+REPLIES: dict[str, int] = {'/charts': 2, '/csv': 2}
+ASYNC_SETTLE = 0.2
+
+
+def get_expected_replies(script: list[Step]) -> int:
+    return sum(
+        REPLIES.get(step, 1) if isinstance(step, str) else 1
+        for step in script
+    )
+
+
+class FakeTelegram(ThreadingHTTPServer):
+    request_queue_size = 128
+
+    def __init__(self, upload: bytes) -> None:
+        super().__init__(('127.0.0.1', 0), FakeTelegramHandler)
+        self.upload = upload
+        self.updates: list[dict[str, Any]] = []
+        self.sent_at: dict[int, float] = {}
+        self.latencies: list[float] = []
+        self.scripts: dict[int, list[Step]] = {}
+        self.replies: dict[int, int] = {}
+        self.waiting: dict[int, int] = {}
+        self.settling: dict[int, bool] = {}
+        self.update_id = 0
+        self.message_id = 0
+        self.done = threading.Event()
+        self.cond = threading.Condition()
+
+    def start_users(self, users: int) -> None:
+        names = [*SCRIPTS]
+
+        with self.cond:
+            for chat_id in range(1, users + 1):
+                self.scripts[chat_id] = [*SCRIPTS[names[chat_id % 3]]]
+                self.replies[chat_id] = 0
+                self.push(chat_id)
+
+    def push(self, chat_id: int) -> None:
+        script = self.scripts[chat_id]
+
+        if not script:
+            del self.scripts[chat_id]
+
+            if not self.scripts:
+                self.done.set()
+
+            return
+
+        step = script.pop(0)
+        self.waiting[chat_id] = (
+            REPLIES.get(step, 1) if isinstance(step, str) else 1
+        )
+        self.settling[chat_id] = self.waiting[chat_id] > 1
+        self.update_id += 1
+        self.message_id += 1
+        message: dict[str, Any] = {
+            'message_id': self.message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User'}
+        }
+
+        if isinstance(step, dict):
+            message['document'] = {
+                'file_id': f'file-{chat_id}',
+                'file_unique_id': f'file-{chat_id}',
+                **step
+            }
+        else:
+            message['text'] = step
+
+            if step.startswith('/'):
+                message['entities'] = [
+                    {'type': 'bot_command', 'offset': 0, 'length': len(step)}
+                ]
+
+        self.updates.append({'update_id': self.update_id, 'message': message})
+        self.sent_at[chat_id] = time.perf_counter()
+        self.cond.notify_all()
+
+    def push_settled(self, chat_id: int) -> None:
+        with self.cond:
+            self.push(chat_id)
+
+    def reply(self, chat_id: int) -> dict[str, Any]:
+        with self.cond:
+            self.message_id += 1
+            self.replies[chat_id] += 1
+            self.waiting[chat_id] -= 1
+
+            if not self.waiting[chat_id]:
+                self.latencies.append(
+                    time.perf_counter() - self.sent_at[chat_id]
+                )
+
+                if chat_id in self.scripts and self.settling[chat_id]:
+                    threading.Timer(
+                        ASYNC_SETTLE,
+                        self.push_settled,
+                        args=(chat_id,)
+                    ).start()
+                elif chat_id in self.scripts:
+                    self.push(chat_id)
+
+            return {
+                'message_id': self.message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'}
+            }
+
+    def get_updates(self, offset: int, timeout: float) -> list[Any]:
+        deadline = time.monotonic() + timeout
+
+        with self.cond:
+            while True:
+                self.updates = [
+                    update for update in self.updates
+                    if update['update_id'] >= offset
+                ]
+
+                if self.updates or time.monotonic() >= deadline:
+                    return [*self.updates]
+
+                self.cond.wait(deadline - time.monotonic())
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    server: FakeTelegram
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def respond(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.respond(self.server.upload, 'text/csv')
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers['Content-Length'] or 0))
+        method = self.path.rsplit('/', 1)[-1]
+
+        if 'json' in (self.headers['Content-Type'] or ''):
+            data: dict[str, Any] = json.loads(body or b'{}')
+        else:
+            match = re.search(rb'name="chat_id"\r\n\r\n(-?\d+)', body)
+            data = {'chat_id': int(match.group(1)) if match else 0}
+
+        result: Any = True
+
+        if method == 'getMe':
+            result = {
+                'id': 1, 'is_bot': True,
+                'first_name': 'Bot', 'username': 'bot'
+            }
+        elif method == 'getUpdates':
+            result = self.server.get_updates(
+                int(data.get('offset') or 0),
+                float(data.get('timeout') or 0)
+            )
+        elif method == 'getFile':
+            result = {
+                'file_id': data['file_id'],
+                'file_unique_id': data['file_id'],
+                'file_path': 'documents/upload.csv'
+            }
+        elif method.startswith('send'):
+            result = self.server.reply(int(data['chat_id']))
+
+            if method == 'sendMediaGroup':
+                result = [result]
+
+        self.respond(
+            json.dumps({'ok': True, 'result': result}).encode(),
+            'application/json'
+        )
+
+
+def run(mode: str, users: int) -> None:
+    from app.bot import Bot
+    from app.bot.runtime import AsyncRuntime
+    from app.db.pool import pool
+
+    with pool.read() as conn:
+        frame = pd.read_sql_query(
+            'SELECT * FROM data LIMIT 1000',
+            con=conn
+        )
+
+    upload = io.BytesIO()
+    frame.drop(columns='price_doc').to_csv(upload, index=False)
+    server = FakeTelegram(upload.getvalue())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ['TELEGRAM_BASE_URL'] = f'{url}/bot'
+    os.environ['TELEGRAM_BASE_FILE_URL'] = f'{url}/file/bot'
+    bot = Bot()
+
+    start = time.perf_counter()
+    server.start_users(users)
+
+    if mode == 'asyncio':
+        runtime = AsyncRuntime(
+            bot.dispatcher,
+            workers=int(os.environ.get('HANDLER_WORKERS', 8)),
+            poll_timeout=1
+        )
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(
+            target=loop.run_until_complete,
+            args=(runtime.run(handle_signals=False),)
+        )
+        thread.start()
+        server.done.wait()
+        elapsed = time.perf_counter() - start
+        loop.call_soon_threadsafe(runtime.stop)
+        thread.join()
+    else:
+        bot.updater.start_polling(poll_interval=0, timeout=1)
+        server.done.wait()
+        elapsed = time.perf_counter() - start
+        bot.updater.stop()
+
+    server.shutdown()
+    expected = {
+        chat_id: get_expected_replies(SCRIPTS[[*SCRIPTS][chat_id % 3]])
+        for chat_id in server.replies
+    }
+    assert server.replies == expected, 'Replies were lost or duplicated.'
+
+    latencies = sorted(server.latencies)
+    print(
+        f'{mode}: {users} conversations in {elapsed:.2f} s '
+        f'({len(latencies) / elapsed:.1f} msg/s), '
+        f'latency p50 {statistics.median(latencies) * 1000:.0f} ms, '
+        f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms'
+    )
+    print(bot.get_stats_text())
+
+
+def main() -> None:
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'asyncio'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_URI'] = f'{tmp}/sqlite.db'
+        os.environ['BOT_TOKEN'] = TOKEN
+        shutil.copyfile(
+            f'{os.environ["PWD"]}/app/db/sqlite.db',
+            os.environ['DB_URI']
+        )
+        run(mode, USERS)
+
+
+if __name__ == '__main__':
+    main()
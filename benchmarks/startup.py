@@ -0,0 +1,90 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from benchmarks.load_test import TOKEN, FakeTelegram
+
+
+SCRIPT = ['/help', '/query', 'num_room', '2']
+IMPORT_RUNS = 3
+
+
+def measure_import(env: dict[str, str]) -> float:
+    code = (
+        'import sys, time; start = time.perf_counter(); '
+        'import app.bot; '
+        'print(time.perf_counter() - start); '
+        'print(*sorted({"numpy", "pandas"} & sys.modules.keys()))'
+    )
+    timings: list[float] = []
+
+    for _ in range(IMPORT_RUNS):
+        elapsed, loaded = subprocess.run(
+            [sys.executable, '-c', code],
+            env=env,
+            capture_output=True,
+            check=True,
+            text=True
+        ).stdout.splitlines()
+        assert 'pandas' not in loaded.split(), (
+            f'import app.bot loaded {loaded}.'
+        )
+        timings.append(float(elapsed))
+
+    return min(timings)
+
+
+def measure_first_responses(env: dict[str, str]) -> list[float]:
+    server = FakeTelegram(b'')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    env = dict(
+        env,
+        TELEGRAM_BASE_URL=f'{url}/bot',
+        TELEGRAM_BASE_FILE_URL=f'{url}/file/bot'
+    )
+
+    with server.cond:
+        server.scripts[1] = [*SCRIPT]
+        server.replies[1] = 0
+        server.push(1)
+
+    process = subprocess.Popen(
+        [sys.executable, 'app/runner.py'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    try:
+        if not server.done.wait(timeout=60):
+            raise TimeoutError('The bot did not answer in time.')
+    finally:
+        process.terminate()
+        process.wait()
+        server.shutdown()
+
+    return server.latencies
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            BOT_TOKEN=TOKEN,
+            DB_URI=f'{tmp}/sqlite.db',
+            PYTHONPATH=os.environ['PWD']
+        )
+        shutil.copyfile(f'{os.environ["PWD"]}/app/db/sqlite.db', env['DB_URI'])
+
+        print(f'import bot: {measure_import(env) * 1000:.0f} ms')
+
+        for step, latency in zip(SCRIPT, measure_first_responses(env)):
+            print(f'{step!r} answered after {latency * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import numpy as np
+
+
+SIZES = (10_000, 1_000_000, 10_000_000)
+SEED = 42
+CHUNK_ROWS = 100_000
+ROUNDS = int(os.environ.get('BENCH_ROUNDS', 20))
+THRESHOLD = 0.1
+DATA_DIR = f'{os.environ["PWD"]}/benchmarks/data'
+RESULTS_DIR = f'{os.environ["PWD"]}/benchmarks/results'
+
+Stats = dict[str, float]
+Case = Callable[[], Callable[[], Any]]
+
+
+def generate(path: str, rows: int) -> None:
+    shutil.copyfile(f'{os.environ["PWD"]}/app/db/sqlite.db', path)
+    conn = sqlite3.connect(path)
+    source: list[tuple[Any, ...]] = conn.execute(
+        'SELECT * FROM data'
+    ).fetchall()
+    placeholders = ', '.join('?' for _ in source[0])
+    rng = np.random.default_rng(SEED)
+
+    with conn:
+        conn.execute('DELETE FROM data')
+
+        for start in range(0, rows, CHUNK_ROWS):
+            conn.executemany(
+                f'INSERT INTO data VALUES ({placeholders})',
+                [
+                    source[i] for i in rng.integers(
+                        len(source),
+                        size=min(CHUNK_ROWS, rows - start)
+                    )
+                ]
+            )
+
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def get_dataset(rows: int) -> str:
+    path = f'{DATA_DIR}/synthetic-{rows}-{SEED}.db'
+
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        start = time.perf_counter()
+        generate(f'{path}.tmp', rows)
+        os.replace(f'{path}.tmp', path)
+        print(
+            f'generated {rows} rows in {time.perf_counter() - start:.1f} s',
+            file=sys.stderr
+        )
+
+    return path
+
+
+class FakeUser:
+    id = 1
+    first_name = 'Bench'
+    last_name = 'Mark'
+
+
+class FakeDocument:
+    def __init__(self, file_name: str, content: bytes) -> None:
+        self.file_name = file_name
+        self.content = content
+
+    def get_file(self) -> 'FakeDocument':
+        return self
+
+    def download(self, out: io.BufferedIOBase) -> None:
+        out.write(self.content)
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        text: Optional[str],
+        document: Optional[FakeDocument]
+    ) -> None:
+        self.text = text
+        self.document = document
+        self.from_user = FakeUser()
+        self.replies: list[Any] = []
+
+    def reply_text(self, text: str, **kwargs: Any) -> None:
+        self.replies.append(text)
+
+    def reply_document(self, document: io.IOBase, **kwargs: Any) -> None:
+        self.replies.append(document.read())
+
+    def reply_media_group(self, media: list[Any], **kwargs: Any) -> None:
+        self.replies.append(media)
+
+
+class FakeUpdate:
+    def __init__(
+        self,
+        text: Optional[str] = None,
+        document: Optional[FakeDocument] = None
+    ) -> None:
+        self.message = FakeMessage(text, document)
+
+
+class FakeContext:
+    def __init__(self, **user_data: Any) -> None:
+        self.user_data = user_data
+
+
+def fake_update(
+    text: Optional[str] = None,
+    document: Optional[FakeDocument] = None
+) -> Any:
+    return FakeUpdate(text, document)
+
+
+def fake_context(**user_data: Any) -> Any:
+    return FakeContext(**user_data)
+
+
+def quote(value: Any) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+
+    return str(value)
+
+
+def get_cases(rows: int) -> dict[str, tuple[Case, int]]:
+    import pandas as pd
+
+    from app.bot.conversations.insert import InsertHandler
+    from app.bot.conversations.predict import PredictHandler
+    from app.bot.conversations.query import QueryHandler
+    from app.charts import get_cache
+    from app.db.pool import pool
+    from app.ml.registry import get_registry
+
+    query, predict, insert = QueryHandler(), PredictHandler(), InsertHandler()
+    rng = random.Random(SEED)
+
+    with pool.read() as conn:
+        sample: pd.DataFrame = pd.read_sql_query(
+            f'''
+                SELECT *
+                FROM data
+                WHERE rowid % {max(rows // 10_000, 1)} = 0
+                LIMIT 10000
+            ''',
+            con=conn
+        )
+
+    records: list[dict[str, Any]] = sample.to_dict('records')
+    complete = [
+        record for record in records
+        if not any(pd.isna(value) for value in record.values())
+    ]
+
+    def filtering(columns: tuple[str, ...]) -> Case:
+        def setup() -> Callable[[], Any]:
+            record = rng.choice(complete)
+            depth = rng.randint(1, len(columns))
+            filters = {
+                column: quote(record[column])
+                for column in columns[:depth - 1]
+            }
+            update = fake_update(quote(record[columns[depth - 1]]))
+            context = fake_context(filters=filters, param=columns[depth - 1])
+
+            return lambda: query.handle_filtering(update, context)
+
+        return setup
+
+    def ranges() -> Callable[[], Any]:
+        record = rng.choice(complete)
+        columns = ('full_sq', 'build_year', 'num_room')
+        depth = rng.randint(1, len(columns))
+        filters = {
+            column: f'{record[column] - 5:g}..{record[column] + 5:g}'
+            for column in columns[:depth]
+        }
+        update = fake_update(filters.pop(columns[depth - 1]))
+        context = fake_context(filters=filters, param=columns[depth - 1])
+
+        return lambda: query.handle_filtering(update, context)
+
+    def output() -> Callable[[], Any]:
+        record = rng.choice(complete)
+        update = fake_update('output')
+        context = fake_context(filters={
+            column: quote(record[column]) for column in query.columns
+        })
+
+        return lambda: query.handle_output_prompt(update, context)
+
+    def charts() -> Callable[[], Any]:
+        record = rng.choice(complete)
+        update = fake_update('/charts')
+        context = fake_context(filters={
+            column: quote(record[column]) for column in ('num_room', 'state')
+        })
+        get_cache().clear()
+
+        return lambda: query.handle_charts_command(update, context)
+
+    def prediction() -> Callable[[], Any]:
+        record = rng.choice(complete)
+        update = fake_update('YES')
+        context = fake_context(filters={
+            column: quote(record[column])
+            for column in ('full_sq', 'floor', 'build_year', 'num_room')
+        })
+        get_registry().models.clear()
+
+        return lambda: query.handle_prediction_prompt(update, context)
+
+    upload = io.BytesIO()
+    sample.drop(columns='price_doc').to_csv(upload, index=False)
+
+    def batch() -> Callable[[], Any]:
+        update = fake_update(
+            document=FakeDocument('sample.csv', upload.getvalue())
+        )
+
+        return lambda: predict.handle_file_upload(update, fake_context())
+
+    def single_insert() -> Callable[[], Any]:
+        record = rng.choice(records)
+        update = fake_update(','.join(
+            '' if pd.isna(record[column]) else str(record[column])
+            for column in insert.columns
+        ))
+        context = fake_context(insert={'price_doc': str(record['price_doc'])})
+
+        return lambda: insert.handle_entering_others(update, context)
+
+    bulk_upload = io.BytesIO()
+    sample.head(1000).to_csv(bulk_upload, index=False)
+
+    def bulk_insert() -> Callable[[], Any]:
+        update = fake_update(
+            document=FakeDocument('sample.csv', bulk_upload.getvalue())
+        )
+
+        return lambda: insert.handle_bulk_upload(update, fake_context())
+
+    return {
+        'query.filtering.cube': (
+            filtering(('num_room', 'state', 'material', 'sub_area')),
+            ROUNDS * 10
+        ),
+        'query.filtering.sql': (
+            filtering(('full_sq', 'build_year', 'floor')),
+            ROUNDS * 10
+        ),
+        'query.filtering.range': (ranges, ROUNDS * 10),
+        'query.output': (output, ROUNDS),
+        'query.charts': (charts, max(ROUNDS // 4, 1)),
+        'query.prediction': (prediction, ROUNDS * 10),
+        'predict.batch': (batch, max(ROUNDS // 4, 1)),
+        'insert.single': (single_insert, ROUNDS * 10),
+        'insert.bulk': (bulk_insert, max(ROUNDS // 4, 1))
+    }
+
+
+def measure(setup: Case, rounds: int) -> Stats:
+    setup()()
+    timings: list[float] = []
+
+    for _ in range(rounds):
+        call = setup()
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+
+    return dict(
+        rounds=rounds,
+        min=min(timings),
+        max=max(timings),
+        mean=statistics.mean(timings),
+        median=statistics.median(timings),
+        stddev=statistics.stdev(timings) if rounds > 1 else 0.0
+    )
+
+
+def run_worker(rows: int, only: Optional[list[str]]) -> None:
+    from app.db.indexes import ensure_indexes
+    from app.db.utils import get_columns_meta
+
+    ensure_indexes(get_columns_meta())
+    results: dict[str, Stats] = {}
+
+    for name, (setup, rounds) in get_cases(rows).items():
+        if only is None or any(name.startswith(prefix) for prefix in only):
+            results[name] = measure(setup, rounds)
+            print(
+                f'{rows:>10} {name:<24} '
+                f'median {results[name]["median"] * 1000:9.2f} ms',
+                file=sys.stderr
+            )
+
+    print(json.dumps(results))
+
+
+def run_size(rows: int, only: Optional[list[str]]) -> dict[str, Stats]:
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copyfile(get_dataset(rows), f'{tmp}/sqlite.db')
+        output = subprocess.run(
+            [
+                sys.executable, '-m', 'benchmarks.suite',
+                '--worker', '--rows', str(rows),
+                *(['--only', *only] if only else [])
+            ],
+            env=dict(os.environ, DB_URI=f'{tmp}/sqlite.db'),
+            stdout=subprocess.PIPE,
+            check=True,
+            text=True
+        ).stdout
+
+    results: dict[str, Stats] = json.loads(output.splitlines()[-1])
+
+    return results
+
+
+def get_commit() -> tuple[str, bool]:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ['git', *args],
+            cwd=os.environ['PWD'],
+            stdout=subprocess.PIPE,
+            check=True,
+            text=True
+        ).stdout.strip()
+
+    return (
+        git('rev-parse', '--short=12', 'HEAD'),
+        bool(git('status', '--porcelain', '--untracked-files=no'))
+    )
+
+
+def compare(current: dict[str, Any], reference: dict[str, Any]) -> bool:
+    regressed = False
+    print(f'\n{reference["commit"]} -> {current["commit"]} (median)')
+
+    for rows, results in current['sizes'].items():
+        for name, stats in results.items():
+            baseline = reference['sizes'].get(rows, {}).get(name)
+
+            if baseline is None:
+                continue
+
+            ratio = stats['median'] / baseline['median']
+            flag = ''
+
+            if ratio > 1 + THRESHOLD:
+                flag = '  REGRESSION'
+                regressed = True
+            elif ratio < 1 - THRESHOLD:
+                flag = '  improvement'
+
+            print(
+                f'{rows:>10} {name:<24} '
+                f'{baseline["median"] * 1000:9.2f} -> '
+                f'{stats["median"] * 1000:9.2f} ms ({ratio:.2f}x){flag}'
+            )
+
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--rows',
+        type=int,
+        nargs='+',
+        default=SIZES,
+        help='table sizes to generate and benchmark'
+    )
+    parser.add_argument(
+        '--only',
+        nargs='+',
+        help='benchmark names (or prefixes) to run'
+    )
+    parser.add_argument(
+        '--compare',
+        help='commit whose stored results to compare against'
+    )
+    parser.add_argument(
+        '--worker',
+        action='store_true',
+        help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.rows[0], args.only)
+
+        return
+
+    reference: Optional[dict[str, Any]] = None
+
+    if args.compare:
+        [name] = [
+            name for name in os.listdir(RESULTS_DIR)
+            if name.startswith(args.compare)
+        ]
+
+        with open(f'{RESULTS_DIR}/{name}') as file:
+            reference = json.load(file)
+
+    commit, dirty = get_commit()
+    current = dict(
+        commit=commit + ('-dirty' if dirty else ''),
+        created=datetime.now(timezone.utc).isoformat(),
+        python=platform.python_version(),
+        machine=platform.platform(),
+        sizes={str(rows): run_size(rows, args.only) for rows in args.rows}
+    )
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+
+    with open(f'{RESULTS_DIR}/{current["commit"]}.json', 'w') as file:
+        json.dump(current, file, indent=2)
+
+    print(f'results saved to {RESULTS_DIR}/{current["commit"]}.json')
+
+    if reference is not None and compare(current, reference):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
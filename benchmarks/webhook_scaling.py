@@ -0,0 +1,241 @@
+import http.client
+import io
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from .load_test import (
+    SCRIPTS,
+    TOKEN,
+    FakeTelegram,
+    Step,
+    get_expected_replies
+)
+
+
+MAX_WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+CONNECTIONS = 16
+STARTUP_TIMEOUT = 120
+REPLY_TIMEOUT = 300
+CHARTS_SCRIPT: list[Step] = ['/query', 'num_room', '2', '/charts']
+
+
+def get_free_port(count: int) -> int:
+    while True:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port: int = sock.getsockname()[1]
+
+        if port + count < 65536 and all(
+            is_free(port + offset) for offset in range(count + 1)
+        ):
+            return port
+
+
+def is_free(port: int) -> bool:
+    with socket.socket() as sock:
+        return sock.connect_ex(('127.0.0.1', port)) != 0
+
+
+def wait_ready(ports: list[int], cluster: subprocess.Popen[bytes]) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+
+    while any(is_free(port) for port in ports):
+        if cluster.poll() is not None:
+            raise RuntimeError('The cluster exited during startup.')
+        elif time.monotonic() > deadline:
+            raise TimeoutError('The cluster did not start in time.')
+
+        time.sleep(0.2)
+
+
+def deliver(server: FakeTelegram, port: int) -> None:
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+
+    while not server.done.is_set():
+        with server.cond:
+            while not server.updates and not server.done.is_set():
+                server.cond.wait(0.5)
+
+            if not server.updates:
+                return
+
+            update = server.updates.pop(0)
+
+        try:
+            conn.request(
+                'POST', f'/{TOKEN}', json.dumps(update).encode(),
+                {'Content-Type': 'application/json'}
+            )
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            status = 0
+
+        if status != 200:
+            with server.cond:
+                server.updates.append(update)
+
+            time.sleep(0.1)
+
+
+def deliver_all(server: FakeTelegram, port: int) -> None:
+    deliverers = [
+        threading.Thread(target=deliver, args=(server, port))
+        for _ in range(CONNECTIONS)
+    ]
+
+    for thread in deliverers:
+        thread.start()
+
+    answered = server.done.wait(REPLY_TIMEOUT)
+    server.done.set()
+
+    for thread in deliverers:
+        thread.join()
+
+    if not answered:
+        raise TimeoutError('The cluster stopped answering.')
+
+
+def check_rejected(port: int) -> None:
+    path = f'/{TOKEN}'.encode()
+    requests = {
+        b'POST /other HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}': 404,
+        b'POST ' + path + b' HTTP/1.1\r\n'
+        + f'Content-Length: {2 ** 40}\r\n\r\n'.encode(): 413,
+        b'POST ' + path + b' HTTP/1.1\r\n'
+        + b'X-Padding: 1\r\n' * 100 + b'\r\n': 400,
+        b'POST ' + path + b' HTTP/1.1\r\nContent-Length: 3\r\n\r\n[1]': 400
+    }
+
+    for request, status in requests.items():
+        with socket.create_connection(('127.0.0.1', port)) as sock:
+            sock.sendall(request)
+            line = sock.makefile('rb').readline()
+
+        assert line.split()[1:2] == [str(status).encode()], (request, line)
+
+
+def check_charts(server: FakeTelegram, port: int, workers: int) -> None:
+    chat_ids = range(USERS + 1, USERS + 1 + workers)
+
+    with server.cond:
+        for chat_id in chat_ids:
+            server.scripts[chat_id] = [*CHARTS_SCRIPT]
+            server.replies[chat_id] = 0
+            server.push(chat_id)
+
+    deliver_all(server, port)
+
+    for chat_id in chat_ids:
+        assert server.replies.pop(chat_id) == get_expected_replies(
+            CHARTS_SCRIPT
+        ), f'Worker {chat_id % workers} did not answer /charts.'
+
+    server.latencies.clear()
+    server.done.clear()
+
+
+def run(workers: int, upload: bytes, tmp: str) -> float:
+    server = FakeTelegram(upload)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    port = get_free_port(workers)
+
+    db_uri = f'{tmp}/sqlite-{workers}.db'
+    shutil.copyfile(f'{os.environ["PWD"]}/app/db/sqlite.db', db_uri)
+    env = os.environ | dict(
+        BOT_TOKEN=TOKEN,
+        BOT_RUNTIME='webhook',
+        DB_URI=db_uri,
+        STATE_URI=f'{tmp}/state-{workers}.db',
+        TELEGRAM_BASE_URL=f'{url}/bot',
+        TELEGRAM_BASE_FILE_URL=f'{url}/file/bot',
+        WEBHOOK_WORKERS=str(workers),
+        WEBHOOK_LISTEN='127.0.0.1',
+        WEBHOOK_PORT=str(port),
+        WEBHOOK_URL='',
+        METRICS_PORT='',
+        PYTHONPATH=os.pathsep.join(
+            [os.environ['PWD'], os.environ.get('PYTHONPATH', '')]
+        )
+    )
+    cluster = subprocess.Popen(
+        [sys.executable, 'app/runner.py'],
+        cwd=os.environ['PWD'],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+
+    try:
+        wait_ready(
+            [port, *(port + 1 + index for index in range(workers))],
+            cluster
+        )
+        check_rejected(port)
+        check_charts(server, port, workers)
+        start = time.perf_counter()
+        server.start_users(USERS)
+        deliver_all(server, port)
+        elapsed = time.perf_counter() - start
+    finally:
+        cluster.terminate()
+        cluster.wait()
+        server.shutdown()
+
+    expected = {
+        chat_id: get_expected_replies(SCRIPTS[[*SCRIPTS][chat_id % 3]])
+        for chat_id in server.replies
+    }
+    assert server.replies == expected, 'Replies were lost or duplicated.'
+
+    latencies = sorted(server.latencies)
+    throughput = len(latencies) / elapsed
+    print(
+        f'{workers} workers: {USERS} conversations in {elapsed:.2f} s '
+        f'({throughput:.1f} msg/s), '
+        f'latency p50 {statistics.median(latencies) * 1000:.0f} ms, '
+        f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms'
+    )
+
+    return throughput
+
+
+def main() -> None:
+    with sqlite3.connect(f'{os.environ["PWD"]}/app/db/sqlite.db') as conn:
+        frame = pd.read_sql_query('SELECT * FROM data LIMIT 1000', conn)
+
+    upload = io.BytesIO()
+    frame.drop(columns='price_doc').to_csv(upload, index=False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            workers: run(workers, upload.getvalue(), tmp)
+            for workers in range(1, MAX_WORKERS + 1)
+        }
+
+    print(f'CPU cores: {os.cpu_count()}')
+
+    for workers, throughput in results.items():
+        print(
+            f'{workers} workers: {throughput / results[1]:.2f}x '
+            f'the single-worker throughput'
+        )
+
+
+if __name__ == '__main__':
+    main()